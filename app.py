@@ -1,12 +1,31 @@
+import atexit
+import functools
+import heapq
 import json
 import math
+import multiprocessing
 import os
-from dataclasses import dataclass
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from multiprocessing import shared_memory
 from typing import Dict, List, Tuple, Optional, Any
 
-from flask import Flask, request, jsonify
+import numpy as np
+from flask import Flask, request
 from flask_cors import CORS
 
+try:
+    import orjson
+except ImportError:  # orjson not installed: fall back to the stdlib json module
+    orjson = None
+
+try:
+    from search_numba import specialized_core
+except ImportError:  # numba not installed: fall back to the pure-Python search
+    specialized_core = None
+
 
 # -----------------------------
 # Config
@@ -18,55 +37,171 @@ EDGES_PATH = os.path.join(DATA_DIR, "edges.json")
 BASE_SPEED_MPS = 1.2   # baseline walking speed for time computation
 V_MAX_MPS = 1.6        # admissible upper-bound speed for heuristic
 
+LANDMARK_COUNT = 8     # ALT landmarks picked by farthest-point sampling
+
+STATUS_OPEN = 0        # live edge status codes used by the array-based search
+STATUS_BLOCKED = 1
+
+ROUTE_WORKERS = int(os.environ.get("ROUTE_WORKERS", "0"))   # >0: solve routes in a process pool
+
 
 # -----------------------------
 # Graph Structures
 # -----------------------------
 @dataclass(frozen=True)
-class Arc:
-    edge_id: str
-    u: str
-    v: str
-    ada: bool
-    edge_type: str
-    length_m: float
-
-
-def euclid_3d(a: List[float], b: List[float]) -> float:
-    dx = a[0] - b[0]
-    dy = a[1] - b[1]
-    dz = a[2] - b[2]
-    return math.sqrt(dx * dx + dy * dy + dz * dz)
-
-
-def load_graph(nodes_path: str, edges_path: str) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, List[str]], Dict[str, Arc]]:
+class Graph:
     """
-    Returns:
-      nodes: { node_id: {"pos":[x,y,z], "floor":... , ...} }
-      adj:   { node_id: [edge_id, edge_id, ...] }  # outgoing arcs
-      arcs:  { edge_id: Arc(...) }
+    Struct-of-Arrays station graph.
+    Nodes and directional arcs are addressed by contiguous integer ids;
+    string ids ("NM", "UP2__UP3") only appear at the API boundary.
+    All arrays are made read-only on construction.
     """
-    with open(nodes_path, "r", encoding="utf-8") as f:
-        nodes = json.load(f)
-
-    with open(edges_path, "r", encoding="utf-8") as f:
-        edges = json.load(f)
-
-    adj: Dict[str, List[str]] = {}
-    arcs: Dict[str, Arc] = {}
+    node_ids: List[str]              # node index -> node_id
+    node_index: Dict[str, int]       # node_id -> node index
+    pos: np.ndarray                  # (N, 3) float32
+    edge_ids: List[str]              # arc index -> directional edge_id "U__V"
+    edge_index: Dict[str, int]       # directional edge_id -> arc index
+    edge_u: np.ndarray               # (E,) int32
+    edge_v: np.ndarray               # (E,) int32
+    length_m: np.ndarray             # (E,) float32
+    base_time_s: np.ndarray          # (E,) float32, length_m / BASE_SPEED_MPS
+    ada: np.ndarray                  # (E,) uint8
+    edge_type_id: np.ndarray         # (E,) uint8
+    is_stairs: np.ndarray            # (E,) uint8
+    edge_types: List[str]            # edge_type_id -> lowercased edge type
+    adj_offsets: np.ndarray          # (N+1,) int32, CSR row pointers
+    adj_edges: np.ndarray            # (E,) int32, outgoing arcs grouped by u
+    radj_offsets: np.ndarray         # (N+1,) int32, reverse CSR row pointers
+    radj_edges: np.ndarray           # (E,) int32, incoming arcs grouped by v
+    landmarks: np.ndarray            # (K,) int32, ALT landmark node ids
+    landmark_dist: np.ndarray        # (N, K) float32, static path length to each landmark
+
+    def __post_init__(self):
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if isinstance(value, np.ndarray):
+                value.setflags(write=False)
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_ids)
+
+
+def shortest_lengths(adj_offsets: np.ndarray, adj_edges: np.ndarray, edge_v: np.ndarray,
+                     length_m: np.ndarray, source: int) -> np.ndarray:
+    """
+    Dijkstra over static arc lengths (no live state, no constraints).
+    Unreachable nodes get inf.
+    """
+    dist = np.full(len(adj_offsets) - 1, np.inf, dtype=np.float64)
+    dist[source] = 0.0
+    heap: List[Tuple[float, int]] = [(0.0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(adj_offsets[u], adj_offsets[u + 1]):
+            e = adj_edges[k]
+            v = int(edge_v[e])
+            nd = d + float(length_m[e])
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist
+
+
+def select_landmarks(adj_offsets: np.ndarray, adj_edges: np.ndarray, edge_v: np.ndarray,
+                     length_m: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Farthest-point sampling of ALT landmarks.
+    Returns (landmarks, dist) where dist[v, i] is the static path length
+    between landmark i and node v. Arc lengths are symmetric, so one matrix
+    serves both directions. Unreachable pairs are stored as 0, which keeps
+    the bound admissible (such pairs have no path anyway).
+    """
+    n = len(adj_offsets) - 1
+    k = min(k, n)
+    landmarks: List[int] = []
+    columns: List[np.ndarray] = []
+    # seed with the node farthest from node 0, then keep adding the node
+    # farthest from all landmarks chosen so far
+    seed = shortest_lengths(adj_offsets, adj_edges, edge_v, length_m, 0) if n else np.zeros(0)
+    closest = np.where(np.isfinite(seed), seed, -1.0)
+    for _ in range(k):
+        lm = int(np.argmax(closest))
+        if lm in landmarks:
+            break
+        d = shortest_lengths(adj_offsets, adj_edges, edge_v, length_m, lm)
+        landmarks.append(lm)
+        columns.append(d)
+        closest = np.minimum(closest, np.where(np.isfinite(d), d, -1.0))
+
+    dist = np.zeros((n, len(landmarks)), dtype=np.float32)
+    for i, d in enumerate(columns):
+        dist[:, i] = np.where(np.isfinite(d), d, 0.0)
+    return np.asarray(landmarks, dtype=np.int32), dist
+
+
+def read_json_file(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_graph(nodes_path: str, edges_path: str) -> Graph:
+    """
+    Builds the Struct-of-Arrays graph.
+    Edges are bidirectional by default, so every input edge yields two arcs.
+    """
+    nodes = read_json_file(nodes_path)
+    edges = read_json_file(edges_path)
+
+    # one pass over the nodes fills ids, index and positions
+    node_ids: List[str] = []
+    node_index: Dict[str, int] = {}
+    pos = np.empty((len(nodes), 3), dtype=np.float64)
+    for i, (nid, node) in enumerate(nodes.items()):
+        node_ids.append(nid)
+        node_index[nid] = i
+        pos[i] = node["pos"][:3]
+
+    edge_ids: List[str] = []
+    edge_index: Dict[str, int] = {}
+    edge_u: List[int] = []
+    edge_v: List[int] = []
+    ada_l: List[int] = []
+    type_l: List[int] = []
+    edge_types: List[str] = []
+    type_index: Dict[str, int] = {}
 
     def add_arc(u: str, v: str, ada: bool, edge_type: str):
-        # directional edge id
-        edge_id = f"{u}__{v}"
-        if u not in nodes or v not in nodes:
+        if u not in node_index or v not in node_index:
             # skip invalid references
             return
-        length_m = euclid_3d(nodes[u]["pos"], nodes[v]["pos"])
-        arc = Arc(edge_id=edge_id, u=u, v=v, ada=bool(ada), edge_type=str(edge_type), length_m=length_m)
-        arcs[edge_id] = arc
-        if u not in adj:
-            adj[u] = []
-        adj[u].append(edge_id)
+        etype = str(edge_type).lower()
+        if etype not in type_index:
+            type_index[etype] = len(edge_types)
+            edge_types.append(etype)
+        # directional edge id
+        edge_id = f"{u}__{v}"
+        e = edge_index.get(edge_id)
+        if e is None:
+            e = len(edge_ids)
+            edge_index[edge_id] = e
+            edge_ids.append(edge_id)
+            edge_u.append(node_index[u])
+            edge_v.append(node_index[v])
+            ada_l.append(0)
+            type_l.append(0)
+        # a repeated edge keeps its adjacency slot but takes the latest attributes
+        ada_l[e] = int(bool(ada))
+        type_l[e] = type_index[etype]
 
     # edges are bidirectional by default: add both directions
     for e in edges:
@@ -79,223 +214,590 @@ def load_graph(nodes_path: str, edges_path: str) -> Tuple[Dict[str, Dict[str, An
         add_arc(u, v, ada, edge_type)
         add_arc(v, u, ada, edge_type)
 
-    # ensure every node has adjacency list
-    for nid in nodes.keys():
-        if nid not in adj:
-            adj[nid] = []
-
-    return nodes, adj, arcs
+    u_arr = np.asarray(edge_u, dtype=np.int32)
+    v_arr = np.asarray(edge_v, dtype=np.int32)
+    # all arc lengths in one vectorized pass (float64, then stored as float32)
+    delta = pos[u_arr] - pos[v_arr]
+    length_arr = np.sqrt(np.einsum("ij,ij->i", delta, delta)).astype(np.float32)
+    type_arr = np.asarray(type_l, dtype=np.uint8)
+    stairs_id = type_index.get("stairs", -1)
+
+    # CSR adjacency; the stable sort keeps per-node arcs in insertion order
+    def csr(keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        counts = np.bincount(keys, minlength=len(node_ids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int32)
+        return offsets, np.argsort(keys, kind="stable").astype(np.int32)
+
+    adj_offsets, adj_edges = csr(u_arr)
+    radj_offsets, radj_edges = csr(v_arr)
+    landmarks, landmark_dist = select_landmarks(adj_offsets, adj_edges, v_arr, length_arr, LANDMARK_COUNT)
+
+    return Graph(
+        node_ids=node_ids,
+        node_index=node_index,
+        pos=pos.astype(np.float32),
+        edge_ids=edge_ids,
+        edge_index=edge_index,
+        edge_u=u_arr,
+        edge_v=v_arr,
+        length_m=length_arr,
+        base_time_s=(length_arr / BASE_SPEED_MPS).astype(np.float32),
+        ada=np.asarray(ada_l, dtype=np.uint8),
+        edge_type_id=type_arr,
+        is_stairs=(type_arr == stairs_id).astype(np.uint8),
+        edge_types=edge_types,
+        adj_offsets=adj_offsets,
+        adj_edges=adj_edges,
+        radj_offsets=radj_offsets,
+        radj_edges=radj_edges,
+        landmarks=landmarks,
+        landmark_dist=landmark_dist,
+    )
 
 
 # -----------------------------
 # Live State (simulation-ready)
 # -----------------------------
-# This holds dynamic state keyed by directional edge_id: "U__V"
+# Dynamic state arrives keyed by directional edge_id: "U__V", e.g.
+#   "UP2__UP3": {"status": "open", "crowdLevel": 0.4, "speedFactor": 1.0, "hazardLevel": 0.0}
 # You can update it from your simulator (crowd every minute, emergencies, construction, etc.)
-LIVE_STATE: Dict[str, Dict[str, Any]] = {
-    "graphVersion": 1,
-    "edges": {
-        # example:
-        # "UP2__UP3": {"status": "open", "crowdLevel": 0.4, "speedFactor": 1.0, "hazardLevel": 0.0}
-    }
-}
-
-
-def get_edge_state(edge_id: str) -> Dict[str, Any]:
-    st = LIVE_STATE["edges"].get(edge_id)
-    if st is None:
-        # default state
-        return {"status": "open", "crowdLevel": 0.0, "speedFactor": 1.0, "hazardLevel": 0.0}
-    # fill defaults if missing
-    return {
-        "status": st.get("status", "open"),
-        "crowdLevel": float(st.get("crowdLevel", 0.0)),
-        "speedFactor": float(st.get("speedFactor", 1.0)),
-        "hazardLevel": float(st.get("hazardLevel", 0.0)),
-    }
+@dataclass(frozen=True, eq=False)
+class LiveSnapshot:
+    """
+    Immutable live state: the posted edges dict plus the same state mirrored
+    into per-arc arrays. Array values are pre-clamped to the ranges the cost
+    uses, so the search only does array reads.
+
+    Readers take GLOBAL_STATE once per request and use that snapshot
+    throughout; writers build a new snapshot and swap the reference under
+    STATE_LOCK, so a request never sees a half-applied update. Hashes by
+    identity, so each snapshot is a fresh route-cache key.
+    """
+    version: int                     # graphVersion reported to clients
+    revision: int                    # internal counter, +1 per update
+    edges: Dict[str, Any]            # edges state as posted (after mirroring)
+    status: np.ndarray               # (E,) uint8, STATUS_OPEN / STATUS_BLOCKED
+    speed: np.ndarray                # (E,) float32, max(1, speedFactor)
+    crowd: np.ndarray                # (E,) float32, crowdLevel clamped to [0, 1]
+    hazard: np.ndarray               # (E,) float32, hazardLevel clamped to [0, 1]
+
+
+def build_live_snapshot(graph: Graph, edges_state: Dict[str, Any], version: int, revision: int) -> LiveSnapshot:
+    """
+    Parses an edges-state dict in one pass, then writes all arcs with a
+    single fancy-indexed assignment per field. Missing fields fall back to
+    open / speedFactor 1.0 / crowdLevel 0.0 / hazardLevel 0.0.
+    """
+    idxs: List[int] = []
+    blocked: List[bool] = []
+    speed_vals: List[Any] = []
+    crowd_vals: List[Any] = []
+    hazard_vals: List[Any] = []
+    for edge_id, st in edges_state.items():
+        e = graph.edge_index.get(edge_id)
+        if e is None or not isinstance(st, dict):
+            continue
+        idxs.append(e)
+        blocked.append(st.get("status", "open") == "blocked")
+        speed_vals.append(st.get("speedFactor", 1.0))
+        crowd_vals.append(st.get("crowdLevel", 0.0))
+        hazard_vals.append(st.get("hazardLevel", 0.0))
+
+    status = np.full(graph.num_edges, STATUS_OPEN, dtype=np.uint8)
+    speed = np.ones(graph.num_edges, dtype=np.float32)
+    crowd = np.zeros(graph.num_edges, dtype=np.float32)
+    hazard = np.zeros(graph.num_edges, dtype=np.float32)
+    if idxs:
+        idx = np.asarray(idxs, dtype=np.int32)
+        status[idx] = np.where(np.asarray(blocked), STATUS_BLOCKED, STATUS_OPEN)
+        speed[idx] = np.maximum(1.0, np.asarray(speed_vals, dtype=np.float32))
+        crowd[idx] = np.clip(np.asarray(crowd_vals, dtype=np.float32), 0.0, 1.0)
+        hazard[idx] = np.clip(np.asarray(hazard_vals, dtype=np.float32), 0.0, 1.0)
+    for arr in (status, speed, crowd, hazard):
+        arr.setflags(write=False)
+    return LiveSnapshot(
+        version=version, revision=revision, edges=edges_state,
+        status=status, speed=speed, crowd=crowd, hazard=hazard,
+    )
 
 
 # -----------------------------
 # Constraints + Cost
 # -----------------------------
-def arc_allowed(arc: Arc, constraints: Dict[str, Any]) -> bool:
-    # live blocking (emergency)
-    st = get_edge_state(arc.edge_id)
-    if st["status"] == "blocked":
-        return False
-
-    avoid_stairs = bool(constraints.get("avoidStairs", False))
-    require_elevator = bool(constraints.get("requireElevator", False))
+def parse_constraints(constraints: Dict[str, Any]) -> Tuple[bool, bool]:
+    """
+    (avoid_stairs, require_elevator), parsed once per request.
+    """
     # keep avoidHazards as a flag for cost (soft) unless you want hard-blocking
     # avoid_hazards = bool(constraints.get("avoidHazards", False))
+    return (
+        bool(constraints.get("avoidStairs", False)),
+        bool(constraints.get("requireElevator", False)),
+    )
+
+
+def parse_weights(weights: Dict[str, float]) -> Tuple[float, float, float, float]:
+    """
+    (w_time, w_dist, w_crowd, w_risk) with defaults, parsed once per request.
+    """
+    return (
+        float(weights.get("time", 0.0)),
+        float(weights.get("distance", 0.0)),
+        float(weights.get("crowd", 0.0)),
+        float(weights.get("risk", 0.0)),
+    )
+
+
+def arcs_allowed(
+    graph: Graph,
+    live: LiveSnapshot,
+    es: np.ndarray,
+    avoid_stairs: bool,
+    require_elevator: bool,
+) -> np.ndarray:
+    """
+    Boolean mask over the arc ids in `es`.
+    """
+    # live blocking (emergency)
+    allowed = live.status[es] != STATUS_BLOCKED
 
     # Hard constraint: avoid stairs
-    if avoid_stairs and arc.edge_type.lower() == "stairs":
-        return False
+    if avoid_stairs:
+        allowed &= graph.is_stairs[es] == 0
 
     # Hard constraint: ADA / elevator-only mode
     # Here we interpret "requireElevator" as "only traverse ADA-compliant edges"
-    if require_elevator and (not arc.ada):
-        return False
+    if require_elevator:
+        allowed &= graph.ada[es] != 0
 
-    return True
+    return allowed
 
 
-def arc_cost(arc: Arc, weights: Dict[str, float]) -> float:
+def arc_costs(
+    graph: Graph,
+    live: LiveSnapshot,
+    es: np.ndarray,
+    w_time: float,
+    w_dist: float,
+    w_crowd: float,
+    w_risk: float,
+) -> np.ndarray:
     """
-    Weighted cost per arc.
-    Accessibility is enforced via constraints (arc_allowed), NOT as a penalty.
+    Weighted cost for each arc id in `es` (float64).
+    Accessibility is enforced via constraints (arcs_allowed), NOT as a penalty.
     All terms are non-negative.
     """
-    st = get_edge_state(arc.edge_id)
-
     # geometry
-    length_m = arc.length_m
-
-    # base time
-    base_time_s = length_m / BASE_SPEED_MPS
+    length_m = graph.length_m[es].astype(np.float64)
 
     # construction slowdown: speedFactor=2.0 => 2x slower
-    time_s = base_time_s * max(1.0, st["speedFactor"])
+    time_s = graph.base_time_s[es].astype(np.float64) * live.speed[es]
 
     # optional crowd slowdown in time (keep monotonic and non-negative)
     alpha = 0.8
-    crowd_level = max(0.0, min(1.0, st["crowdLevel"]))
+    crowd_level = live.crowd[es].astype(np.float64)
     time_s = time_s * (1.0 + alpha * crowd_level)
 
     # separate soft penalties (also monotonic, non-negative)
     crowd_pen = crowd_level * length_m
 
-    hazard_level = max(0.0, min(1.0, st["hazardLevel"]))
+    hazard_level = live.hazard[es].astype(np.float64)
     risk_pen = hazard_level * length_m
 
-    # weights with defaults
-    w_time = float(weights.get("time", 0.0))
-    w_dist = float(weights.get("distance", 0.0))
-    w_crowd = float(weights.get("crowd", 0.0))
-    w_risk = float(weights.get("risk", 0.0))
-
-    cost = (
+    return (
         w_time * time_s
         + w_dist * length_m
         + w_crowd * crowd_pen
         + w_risk * risk_pen
     )
-    return float(cost)
 
 
-def heuristic(node_id: str, goal_id: str, nodes: Dict[str, Dict[str, Any]], weights: Dict[str, float]) -> float:
+def heuristic(graph: Graph, nodes: np.ndarray, goal: int, w_time: float, w_dist: float) -> np.ndarray:
     """
-    Admissible heuristic that combines multiple weights:
-      h = w_time * (straight_line_distance / max_speed) + w_distance * straight_line_distance
-    
+    Admissible heuristic for each node id in `nodes`, combining multiple weights:
+      h = w_time * (lower_bound_distance / max_speed) + w_distance * lower_bound_distance
+
+    lower_bound_distance is the larger of the straight-line distance and the
+    ALT landmark bound max_L |d(L, goal) - d(L, node)|.
+
     This remains admissible because:
-    - Straight-line distance is the shortest possible path
+    - Both bounds never exceed the static shortest path length, and live
+      state / constraints can only remove arcs or make them more expensive
     - V_MAX_MPS is the maximum possible speed (optimistic)
     - Risk and crowd cannot be predicted from position alone, so we assume 0 (optimistic but valid)
     """
-    if node_id not in nodes or goal_id not in nodes:
-        return 0.0
-
-    dist = euclid_3d(nodes[node_id]["pos"], nodes[goal_id]["pos"])
+    delta = graph.pos[nodes].astype(np.float64) - graph.pos[goal]
+    dist = np.sqrt(np.einsum("ij,ij->i", delta, delta))
+    if graph.landmark_dist.shape[1]:
+        alt = np.abs(graph.landmark_dist[nodes] - graph.landmark_dist[goal]).max(axis=1)
+        dist = np.maximum(dist, alt)
 
-    w_time = float(weights.get("time", 0.0))
-    w_dist = float(weights.get("distance", 0.0))
-    
     # Combine time and distance components
     # (crowd and risk weights are not used here since we can't predict them from geometry alone)
-    h = w_time * (dist / V_MAX_MPS) + w_dist * dist
-    
-    return float(h)
+    return w_time * (dist / V_MAX_MPS) + w_dist * dist
 
 
 # -----------------------------
 # A* Search
 # -----------------------------
+class IndexedMinHeap:
+    """
+    Binary min-heap over node ids with decrease-key.
+    Entries are ordered by (key, node id), so ties break deterministically
+    and a node is never in the heap twice.
+    `buffers` = (heap, pos_in_heap, key) lets a caller supply reset arrays
+    (see SearchWorkspace) instead of allocating new ones.
+    """
+
+    def __init__(self, n: int, buffers: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None):
+        if buffers is None:
+            self.heap = np.empty(n, dtype=np.int32)
+            self.pos_in_heap = np.full(n, -1, dtype=np.int32)   # -1 if absent
+            self.key = np.full(n, np.inf, dtype=np.float64)
+        else:
+            self.heap, self.pos_in_heap, self.key = buffers
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _less(self, a: int, b: int) -> bool:
+        ka = self.key[a]
+        kb = self.key[b]
+        return ka < kb or (ka == kb and a < b)
+
+    def _place(self, i: int, node: int):
+        self.heap[i] = node
+        self.pos_in_heap[node] = i
+
+    def _sift_up(self, i: int):
+        node = int(self.heap[i])
+        while i > 0:
+            parent = (i - 1) >> 1
+            p_node = int(self.heap[parent])
+            if not self._less(node, p_node):
+                break
+            self._place(i, p_node)
+            i = parent
+        self._place(i, node)
+
+    def _sift_down(self, i: int):
+        node = int(self.heap[i])
+        while True:
+            child = 2 * i + 1
+            if child >= self.size:
+                break
+            c_node = int(self.heap[child])
+            if child + 1 < self.size:
+                r_node = int(self.heap[child + 1])
+                if self._less(r_node, c_node):
+                    child += 1
+                    c_node = r_node
+            if not self._less(c_node, node):
+                break
+            self._place(i, c_node)
+            i = child
+        self._place(i, node)
+
+    def push_or_decrease(self, node: int, f: float):
+        i = int(self.pos_in_heap[node])
+        if i == -1:
+            self.key[node] = f
+            self._place(self.size, node)
+            self.size += 1
+            self._sift_up(self.size - 1)
+        elif f < self.key[node]:
+            self.key[node] = f
+            self._sift_up(i)
+
+    def min_key(self) -> float:
+        return float(self.key[self.heap[0]])
+
+    def pop_min(self) -> int:
+        node = int(self.heap[0])
+        self.size -= 1
+        self.pos_in_heap[node] = -1
+        if self.size > 0:
+            self._place(0, int(self.heap[self.size]))
+            self._sift_down(0)
+        return node
+
+
+class SearchWorkspace:
+    """
+    Per-node search arrays for both directions (row 0 = forward, row 1 =
+    backward), allocated once per thread and reset before each search.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.g_score = np.empty((2, n), dtype=np.float64)
+        self.came_from_node = np.empty((2, n), dtype=np.int32)
+        self.came_from_edge = np.empty((2, n), dtype=np.int32)
+        self.closed = np.empty((2, n), dtype=np.uint8)
+        self.heap = np.empty((2, n), dtype=np.int32)
+        self.pos_in_heap = np.empty((2, n), dtype=np.int32)
+        self.key = np.empty((2, n), dtype=np.float64)
+
+    def reset(self):
+        self.g_score.fill(np.inf)
+        self.came_from_node.fill(-1)
+        self.came_from_edge.fill(-1)
+        self.closed.fill(0)
+        self.pos_in_heap.fill(-1)
+        self.key.fill(np.inf)
+
+
+_WORKSPACES = threading.local()
+
+
+def search_workspace(n: int) -> SearchWorkspace:
+    """This thread's workspace for an n-node graph, reset and ready to use."""
+    ws = getattr(_WORKSPACES, "ws", None)
+    if ws is None or ws.n != n:
+        ws = SearchWorkspace(n)
+        _WORKSPACES.ws = ws
+    ws.reset()
+    return ws
+
+
 def astar_route(
-    start: str,
-    goal: str,
-    nodes: Dict[str, Dict[str, Any]],
-    adj: Dict[str, List[str]],
-    arcs: Dict[str, Arc],
+    s: int,
+    t: int,
+    graph: Graph,
+    live: LiveSnapshot,
     constraints: Dict[str, Any],
     weights: Dict[str, float],
-) -> Tuple[List[str], List[str], float]:
+) -> Tuple[List[int], List[int], float]:
     """
+    Bidirectional A*: a forward search from start over outgoing arcs and a
+    backward search from goal over incoming arcs, expanded alternately.
+    Both use the Euclidean heuristic towards their own target, which is
+    consistent because every arc costs at least its straight-line bound.
+    The search stops once either frontier's minimum f reaches mu, the cost
+    of the best start-goal path seen so far.
+
     Returns:
-      path_nodes: [start, ..., goal]
-      path_edges: [edge_id, edge_id, ...] directional
+      path_nodes: [s, ..., t] node ids
+      path_edges: [arc id, arc id, ...] directional
       total_cost
     Raises ValueError if no path.
     """
-    if start not in nodes:
-        raise ValueError(f"Unknown start node: {start}")
-    if goal not in nodes:
-        raise ValueError(f"Unknown goal node: {goal}")
-
-    # Priority queue: (fScore, tie, node_id)
-    import heapq
-    open_heap: List[Tuple[float, int, str]] = []
-    tie = 0
-
-    g_score: Dict[str, float] = {start: 0.0}
-    came_from_node: Dict[str, str] = {}
-    came_from_edge: Dict[str, str] = {}
-
-    f0 = heuristic(start, goal, nodes, weights)
-    heapq.heappush(open_heap, (f0, tie, start))
-
-    in_open: Dict[str, bool] = {start: True}
-    closed: Dict[str, bool] = {}
-
-    while open_heap:
-        _, _, current = heapq.heappop(open_heap)
-        in_open[current] = False
-
-        if current == goal:
-            # reconstruct
-            path_nodes: List[str] = [current]
-            path_edges: List[str] = []
-            while current in came_from_node:
-                e_id = came_from_edge[current]
-                prev = came_from_node[current]
-                path_edges.append(e_id)
-                path_nodes.append(prev)
-                current = prev
-            path_nodes.reverse()
-            path_edges.reverse()
-            return path_nodes, path_edges, g_score[goal]
-
-        closed[current] = True
-
-        for e_id in adj.get(current, []):
-            arc = arcs[e_id]
-
-            if not arc_allowed(arc, constraints):
-                continue
+    avoid_stairs, require_elevator = parse_constraints(constraints)
+    w_time, w_dist, w_crowd, w_risk = parse_weights(weights)
+
+    # index 0 = forward search from s, index 1 = backward search from t
+    n = graph.num_nodes
+    target = (t, s)
+    offsets = (graph.adj_offsets, graph.radj_offsets)
+    arcs = (graph.adj_edges, graph.radj_edges)
+    far_end = (graph.edge_v, graph.edge_u)
+    ws = search_workspace(n)
+    open_heap = tuple(IndexedMinHeap(n, (ws.heap[d], ws.pos_in_heap[d], ws.key[d])) for d in (0, 1))
+    g_score = ws.g_score
+    came_from_node = ws.came_from_node
+    came_from_edge = ws.came_from_edge
+    closed = ws.closed
+
+    for d, root in ((0, s), (1, t)):
+        g_score[d, root] = 0.0
+        open_heap[d].push_or_decrease(root, float(heuristic(graph, np.array([root]), target[d], w_time, w_dist)[0]))
+
+    mu = 0.0 if s == t else math.inf
+    meet = s if s == t else -1
+
+    d = 0
+    while open_heap[0] and open_heap[1]:
+        if open_heap[0].min_key() >= mu or open_heap[1].min_key() >= mu:
+            break
+
+        current = open_heap[d].pop_min()
+        closed[d, current] = 1
+
+        # relax all outgoing (forward) / incoming (backward) arcs at once
+        es = arcs[d][offsets[d][current]:offsets[d][current + 1]]
+        es = es[arcs_allowed(graph, live, es, avoid_stairs, require_elevator)]
+        neighbors = far_end[d][es]
+        open_nb = closed[d, neighbors] == 0
+        es, neighbors = es[open_nb], neighbors[open_nb]
+
+        tentative_g = g_score[d, current] + arc_costs(graph, live, es, w_time, w_dist, w_crowd, w_risk)
+        better = tentative_g < g_score[d, neighbors]
+        es, neighbors, tentative_g = es[better], neighbors[better], tentative_g[better]
+
+        if neighbors.size:
+            came_from_node[d, neighbors] = current
+            came_from_edge[d, neighbors] = es
+            g_score[d, neighbors] = tentative_g
+            f_score = tentative_g + heuristic(graph, neighbors, target[d], w_time, w_dist)
+            for neighbor, f in zip(neighbors.tolist(), f_score.tolist()):
+                open_heap[d].push_or_decrease(neighbor, f)
+
+            total = tentative_g + g_score[1 - d, neighbors]
+            best = int(np.argmin(total))
+            if total[best] < mu:
+                mu = float(total[best])
+                meet = int(neighbors[best])
+
+        d = 1 - d
+
+    if meet == -1:
+        raise ValueError("No path found under current constraints/state")
+
+    # reconstruct: start .. meet from the forward tree, meet .. goal from the backward tree
+    path_nodes: List[int] = [meet]
+    path_edges: List[int] = []
+    current = meet
+    while came_from_node[0, current] != -1:
+        path_edges.append(int(came_from_edge[0, current]))
+        current = int(came_from_node[0, current])
+        path_nodes.append(current)
+    path_nodes.reverse()
+    path_edges.reverse()
+    current = meet
+    while came_from_node[1, current] != -1:
+        path_edges.append(int(came_from_edge[1, current]))
+        current = int(came_from_node[1, current])
+        path_nodes.append(current)
+    return path_nodes, path_edges, float(mu)
+
+
+def astar_route_jit(
+    s: int,
+    t: int,
+    graph: Graph,
+    live: LiveSnapshot,
+    constraints: Dict[str, Any],
+    weights: Dict[str, float],
+) -> Tuple[List[int], List[int], float]:
+    """
+    Same contract as astar_route, but runs the search in the compiled core
+    specialized for this request's hard constraints.
+    """
+    astar_core = specialized_core(*parse_constraints(constraints))
+    ws = search_workspace(graph.num_nodes)
+    path, total_cost = astar_core(
+        graph.pos, graph.adj_offsets, graph.adj_edges, graph.radj_offsets, graph.radj_edges,
+        graph.edge_u, graph.edge_v, graph.length_m, graph.base_time_s, graph.ada, graph.is_stairs,
+        graph.landmark_dist,
+        live.status, live.speed, live.crowd, live.hazard,
+        s, t,
+        *parse_weights(weights),
+        ws.g_score, ws.came_from_node, ws.came_from_edge, ws.closed,
+        ws.heap, ws.pos_in_heap, ws.key,
+    )
+    if math.isinf(total_cost):
+        raise ValueError("No path found under current constraints/state")
+
+    path_nodes = [s] + graph.edge_v[path].tolist()
+    return path_nodes, path.tolist(), float(total_cost)
+
+
+ROUTE_SOLVER = astar_route_jit if specialized_core is not None else astar_route
+
+
+# -----------------------------
+# Process Pool (optional, ROUTE_WORKERS > 0)
+# -----------------------------
+# Routes are solved in worker processes so concurrent requests are not
+# serialized by the GIL. Workers hold the static graph from import time; the
+# live arrays are shared through multiprocessing.shared_memory instead of
+# being pickled with every request.
+LIVE_FIELDS = (("status", np.uint8), ("speed", np.float32), ("crowd", np.float32), ("hazard", np.float32))
+
+
+class SharedLiveState:
+    """
+    Per-arc live arrays backed by shared memory blocks.
+    header = [seq, revision]; seq is odd while publish() is writing, so a
+    reader can detect a torn copy and retry (seqlock).
+    """
 
-            neighbor = arc.v
-            if closed.get(neighbor, False):
+    def __init__(self, num_edges: int, names: Optional[Dict[str, str]] = None):
+        self.owner = names is None
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+        for field, dtype in (("header", np.int64),) + LIVE_FIELDS:
+            size = (2 if field == "header" else num_edges) * np.dtype(dtype).itemsize
+            if self.owner:
+                self.blocks[field] = shared_memory.SharedMemory(create=True, size=max(1, size))
+            else:
+                self.blocks[field] = shared_memory.SharedMemory(name=names[field])
+        self.header = np.ndarray((2,), dtype=np.int64, buffer=self.blocks["header"].buf)
+        self.arrays = {
+            field: np.ndarray((num_edges,), dtype=dtype, buffer=self.blocks[field].buf)
+            for field, dtype in LIVE_FIELDS
+        }
+        if self.owner:
+            self.header[:] = (0, -1)
+
+    @property
+    def names(self) -> Dict[str, str]:
+        return {field: shm.name for field, shm in self.blocks.items()}
+
+    def publish(self, snap: LiveSnapshot):
+        """Writer side; callers hold STATE_LOCK."""
+        self.header[0] += 1
+        for field, _ in LIVE_FIELDS:
+            self.arrays[field][:] = getattr(snap, field)
+        self.header[1] = snap.revision
+        self.header[0] += 1
+
+    def read(self, revision: int) -> Optional[Tuple[np.ndarray, ...]]:
+        """
+        Returns private copies of the live arrays if the shared state is at
+        `revision`, or None if it has already moved on.
+        """
+        while True:
+            seq = int(self.header[0])
+            if seq & 1:
+                time.sleep(0)   # writer mid-publish: yield instead of spinning
                 continue
+            if int(self.header[1]) != revision:
+                return None
+            copies = tuple(self.arrays[field].copy() for field, _ in LIVE_FIELDS)
+            if int(self.header[0]) == seq:
+                return copies
+            time.sleep(0)
+
+    def close(self):
+        for shm in self.blocks.values():
+            shm.close()
+            if self.owner:
+                shm.unlink()
+
 
-            tentative_g = g_score[current] + arc_cost(arc, weights)
+# worker-process state
+_WORKER_SHARED: Optional[SharedLiveState] = None
+_WORKER_SNAP: Optional[LiveSnapshot] = None
 
-            if (neighbor not in g_score) or (tentative_g < g_score[neighbor]):
-                came_from_node[neighbor] = current
-                came_from_edge[neighbor] = e_id
-                g_score[neighbor] = tentative_g
-                f_score = tentative_g + heuristic(neighbor, goal, nodes, weights)
 
-                if not in_open.get(neighbor, False):
-                    tie += 1
-                    heapq.heappush(open_heap, (f_score, tie, neighbor))
-                    in_open[neighbor] = True
-                else:
-                    # push duplicate; standard lazy PQ strategy
-                    tie += 1
-                    heapq.heappush(open_heap, (f_score, tie, neighbor))
+def _pool_init(names: Dict[str, str]):
+    global _WORKER_SHARED
+    _WORKER_SHARED = SharedLiveState(GRAPH.num_edges, names)
 
-    raise ValueError("No path found under current constraints/state")
+
+def _pool_solve(
+    s: int,
+    t: int,
+    revision: int,
+    constraints: Dict[str, Any],
+    weights: Dict[str, float],
+) -> Optional[Tuple[List[int], List[int], float]]:
+    """
+    Runs in a worker. Returns None if the shared state no longer matches the
+    caller's snapshot, so results are never computed on a different state.
+    """
+    global _WORKER_SNAP
+    if _WORKER_SNAP is None or _WORKER_SNAP.revision != revision:
+        arrays = _WORKER_SHARED.read(revision)
+        if arrays is None:
+            return None
+        status, speed, crowd, hazard = arrays
+        _WORKER_SNAP = LiveSnapshot(
+            version=0, revision=revision, edges={},
+            status=status, speed=speed, crowd=crowd, hazard=hazard,
+        )
+    return ROUTE_SOLVER(s=s, t=t, graph=GRAPH, live=_WORKER_SNAP, constraints=constraints, weights=weights)
 
 
 # -----------------------------
@@ -304,14 +806,123 @@ def astar_route(
 app = Flask(__name__)
 CORS(app)  # for local dev (frontend on different port)
 
-NODES, ADJ, ARCS = load_graph(NODES_PATH, EDGES_PATH)
+
+def _json(obj: Any, status: int = 200):
+    """
+    JSON response; orjson encodes straight to bytes (NumPy scalars/arrays included).
+    """
+    if orjson is not None:
+        body = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps(obj)
+    return app.response_class(body, status=status, mimetype="application/json")
+
+
+GRAPH = load_graph(NODES_PATH, EDGES_PATH)
+
+STATE_LOCK = threading.Lock()
+GLOBAL_STATE = build_live_snapshot(GRAPH, {}, version=1, revision=0)
+
+# created on first use in the serving process only (see route_pool)
+SHARED_LIVE: Optional[SharedLiveState] = None
+ROUTE_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def route_pool() -> Optional[ProcessPoolExecutor]:
+    global SHARED_LIVE, ROUTE_POOL
+    if ROUTE_WORKERS <= 0:
+        return None
+    with STATE_LOCK:
+        if ROUTE_POOL is None:
+            SHARED_LIVE = SharedLiveState(GRAPH.num_edges)
+            SHARED_LIVE.publish(GLOBAL_STATE)
+            # spawn, not fork: this runs in a request thread of an already
+            # multithreaded server, and a forked child could inherit locks
+            # held by other threads
+            ROUTE_POOL = ProcessPoolExecutor(
+                max_workers=ROUTE_WORKERS, initializer=_pool_init, initargs=(SHARED_LIVE.names,),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+            atexit.register(shutdown_route_pool)
+    return ROUTE_POOL
+
+
+def shutdown_route_pool():
+    global SHARED_LIVE, ROUTE_POOL
+    if ROUTE_POOL is not None:
+        ROUTE_POOL.shutdown()
+        ROUTE_POOL = None
+    if SHARED_LIVE is not None:
+        SHARED_LIVE.close()
+        SHARED_LIVE = None
+
+
+def run_solver(
+    s: int,
+    t: int,
+    live: LiveSnapshot,
+    constraints: Dict[str, Any],
+    weights: Dict[str, float],
+) -> Tuple[List[int], List[int], float]:
+    pool = route_pool()
+    if pool is not None:
+        result = pool.submit(_pool_solve, s, t, live.revision, constraints, weights).result()
+        if result is not None:
+            return result
+        # state changed since this request took its snapshot: solve it here
+    return ROUTE_SOLVER(s=s, t=t, graph=GRAPH, live=live, constraints=constraints, weights=weights)
+
+
+@functools.lru_cache(maxsize=1024)
+def cached_route(
+    s: int,
+    t: int,
+    live: LiveSnapshot,
+    constraints_key: frozenset,
+    weights_key: frozenset,
+) -> Tuple[Tuple[int, ...], Tuple[int, ...], float]:
+    """
+    Memoized solver call. Keyed on the LiveSnapshot instance rather than
+    graphVersion: clients may post the same graphVersion with different
+    edges, while every state update builds a new snapshot. Entries for an
+    old snapshot can never hit again, so api_state_update clears the cache
+    on every swap instead of letting it pin stale snapshots' arrays.
+    """
+    path_nodes, path_edges, total_cost = run_solver(
+        s=s,
+        t=t,
+        live=live,
+        constraints=dict(constraints_key),
+        weights=dict(weights_key),
+    )
+    return tuple(path_nodes), tuple(path_edges), total_cost
+
+
+def solve_route(
+    s: int,
+    t: int,
+    live: LiveSnapshot,
+    constraints: Dict[str, Any],
+    weights: Dict[str, float],
+) -> Tuple[Tuple[int, ...], Tuple[int, ...], float]:
+    try:
+        constraints_key = frozenset(constraints.items())
+        weights_key = frozenset(weights.items())
+    except TypeError:
+        # unhashable parameter values (lists, objects): solve without caching
+        path_nodes, path_edges, total_cost = run_solver(
+            s=s, t=t, live=live, constraints=constraints, weights=weights,
+        )
+        return tuple(path_nodes), tuple(path_edges), total_cost
+    return cached_route(s, t, live, constraints_key, weights_key)
 
 
 @app.get("/api/state")
 def api_state():
-    return jsonify({
-        "graphVersion": LIVE_STATE["graphVersion"],
-        "edges": LIVE_STATE["edges"]
+    snap = GLOBAL_STATE
+    return _json({
+        "graphVersion": snap.version,
+        "edges": snap.edges
     })
 
 
@@ -324,7 +935,7 @@ def api_state_update():
     payload = request.get_json(force=True) or {}
     edges = payload.get("edges", {})
     if not isinstance(edges, dict):
-        return jsonify({"error": "edges must be an object/dict"}), 400
+        return _json({"error": "edges must be an object/dict"}, 400)
 
     mirror = payload.get("mirrorUndirected", True)
     new_edges: Dict[str, Any] = {}
@@ -342,14 +953,21 @@ def api_state_update():
             if rev is not None:
                 new_edges[rev] = st
 
-    LIVE_STATE["edges"] = new_edges
-
-    if "graphVersion" in payload:
-        LIVE_STATE["graphVersion"] = int(payload["graphVersion"])
-    else:
-        LIVE_STATE["graphVersion"] = int(LIVE_STATE["graphVersion"]) + 1
+    # build the arrays off to the side; only the version bump and the
+    # pointer swap happen under the lock
+    global GLOBAL_STATE
+    snap = build_live_snapshot(GRAPH, new_edges, version=0, revision=0)
+    with STATE_LOCK:
+        if "graphVersion" in payload:
+            version = int(payload["graphVersion"])
+        else:
+            version = GLOBAL_STATE.version + 1
+        GLOBAL_STATE = replace(snap, version=version, revision=GLOBAL_STATE.revision + 1)
+        if SHARED_LIVE is not None:
+            SHARED_LIVE.publish(GLOBAL_STATE)
+        cached_route.cache_clear()
 
-    return jsonify({"ok": True, "graphVersion": LIVE_STATE["graphVersion"], "mirrored": bool(mirror)})
+    return _json({"ok": True, "graphVersion": version, "mirrored": bool(mirror)})
 
 
 
@@ -366,6 +984,7 @@ def api_route():
     }
     """
     payload = request.get_json(force=True) or {}
+    snap = GLOBAL_STATE
 
     start = payload.get("startNode", "")
     end = payload.get("endNode", "")
@@ -373,35 +992,39 @@ def api_route():
     weights = payload.get("weights", {}) or {}
 
     if not isinstance(start, str) or not start:
-        return jsonify({"error": "startNode is required"}), 400
+        return _json({"error": "startNode is required"}, 400)
     if not isinstance(end, str) or not end:
-        return jsonify({"error": "endNode is required"}), 400
+        return _json({"error": "endNode is required"}, 400)
     if not isinstance(constraints, dict):
-        return jsonify({"error": "constraints must be an object/dict"}), 400
+        return _json({"error": "constraints must be an object/dict"}, 400)
     if not isinstance(weights, dict):
-        return jsonify({"error": "weights must be an object/dict"}), 400
+        return _json({"error": "weights must be an object/dict"}, 400)
 
     try:
-        path_nodes, path_edges, total_cost = astar_route(
-            start=start,
-            goal=end,
-            nodes=NODES,
-            adj=ADJ,
-            arcs=ARCS,
+        # string ids are translated here and in the response only
+        if start not in GRAPH.node_index:
+            raise ValueError(f"Unknown start node: {start}")
+        if end not in GRAPH.node_index:
+            raise ValueError(f"Unknown goal node: {end}")
+
+        path_nodes, path_edges, total_cost = solve_route(
+            s=GRAPH.node_index[start],
+            t=GRAPH.node_index[end],
+            live=snap,
             constraints=constraints,
             weights=weights,
         )
-        return jsonify({
-            "graphVersion": LIVE_STATE["graphVersion"],
-            "pathNodes": path_nodes,
-            "pathEdges": path_edges,
+        return _json({
+            "graphVersion": snap.version,
+            "pathNodes": [GRAPH.node_ids[i] for i in path_nodes],
+            "pathEdges": [GRAPH.edge_ids[e] for e in path_edges],
             "totalCost": total_cost
         })
     except ValueError as e:
-        return jsonify({
-            "graphVersion": LIVE_STATE["graphVersion"],
+        return _json({
+            "graphVersion": snap.version,
             "error": str(e)
-        }), 404
+        }, 404)
 
 
 if __name__ == "__main__":
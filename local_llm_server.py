@@ -1,5 +1,8 @@
+import functools
 import os, time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Literal, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
@@ -29,6 +32,25 @@ app.add_middleware(
 
 Provider = Literal["openai", "gemini", "deepseek"]
 
+# One pooled HTTP session for DeepSeek so keep-alive connections (and TLS
+# sessions) are reused across requests.
+DEEPSEEK_SESSION = requests.Session()
+DEEPSEEK_SESSION.mount(
+    "https://",
+    HTTPAdapter(pool_connections=32, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.2)),
+)
+
+
+# SDK clients are created once per API key and reused (they pool connections internally)
+@functools.lru_cache(maxsize=None)
+def openai_client(key: str) -> OpenAI:
+    return OpenAI(api_key=key)
+
+
+@functools.lru_cache(maxsize=None)
+def gemini_client(key: str) -> "genai.Client":
+    return genai.Client(api_key=key)
+
 class LLMReq(BaseModel):
     provider: Provider
     model: str
@@ -36,22 +58,23 @@ class LLMReq(BaseModel):
     system: Optional[str] = None  # optional system instruction
     temperature: Optional[float] = None
     max_tokens: Optional[int] = None
+    include_raw: Optional[bool] = False  # return the full provider payload in `raw`
 
 class LLMResp(BaseModel):
     provider: str
     model: str
     latency_ms: int
     output_text: str
-    raw: Dict[str, Any]
+    raw: Optional[Dict[str, Any]] = None
 
 
 # ---------------- OpenAI (Responses API) ----------------
-def call_openai(model: str, system: Optional[str], user_input: str, temperature: Optional[float], max_tokens: Optional[int]):
+def call_openai(model: str, system: Optional[str], user_input: str, temperature: Optional[float], max_tokens: Optional[int], include_raw: bool = False):
     key = os.environ.get("OPENAI_API_KEY")
     if not key:
         raise HTTPException(500, "Missing OPENAI_API_KEY in .env.local")
 
-    client = OpenAI(api_key=key)
+    client = openai_client(key)
 
     # Build a simple input; you can later expand to structured messages if needed
     input_text = user_input if not system else f"System:\n{system}\n\nUser:\n{user_input}"
@@ -62,18 +85,20 @@ def call_openai(model: str, system: Optional[str], user_input: str, temperature:
 
     # output_text is a convenience field commonly present
     text = getattr(resp, "output_text", "") or ""
+    if not include_raw:
+        return text, None
     raw = resp.model_dump() if hasattr(resp, "model_dump") else dict(resp)
     return text, raw
 
 
 # ---------------- Gemini API (Google AI Studio / Developer API) ----------------
-def call_gemini(model: str, system: Optional[str], user_input: str, temperature: Optional[float], max_tokens: Optional[int]):
+def call_gemini(model: str, system: Optional[str], user_input: str, temperature: Optional[float], max_tokens: Optional[int], include_raw: bool = False):
     key = os.environ.get("GEMINI_API_KEY")
     if not key:
         raise HTTPException(500, "Missing GEMINI_API_KEY in .env.local")
 
     # Google GenAI SDK supports api_key and/or env var GEMINI_API_KEY. :contentReference[oaicite:1]{index=1}
-    client = genai.Client(api_key=key)
+    client = gemini_client(key)
 
     # SDK: client.models.generate_content(model=..., contents=...) :contentReference[oaicite:2]{index=2}
     # Keep it simple: concatenate system + user into one contents string.
@@ -93,18 +118,16 @@ def call_gemini(model: str, system: Optional[str], user_input: str, temperature:
         # fallback: try to stringify
         text = str(resp)
 
-    # raw: best-effort serialization
-    raw = resp.model_dump() if hasattr(resp, "model_dump") else {"response": str(resp)}
-    try:
-        client.close()
-    except Exception:
-        pass
+    # raw: best-effort serialization (only when asked for)
+    raw = None
+    if include_raw:
+        raw = resp.model_dump() if hasattr(resp, "model_dump") else {"response": str(resp)}
 
     return text, raw
 
 
 # ---------------- DeepSeek "native" (official endpoint) ----------------
-def call_deepseek(model: str, system: Optional[str], user_input: str, temperature: Optional[float], max_tokens: Optional[int]):
+def call_deepseek(model: str, system: Optional[str], user_input: str, temperature: Optional[float], max_tokens: Optional[int], include_raw: bool = False):
     key = os.environ.get("DEEPSEEK_API_KEY")
     if not key:
         raise HTTPException(500, "Missing DEEPSEEK_API_KEY in .env.local")
@@ -127,7 +150,7 @@ def call_deepseek(model: str, system: Optional[str], user_input: str, temperatur
     if max_tokens is not None:
         payload["max_tokens"] = max_tokens
 
-    r = requests.post(
+    r = DEEPSEEK_SESSION.post(
         url,
         headers={"Authorization": f"Bearer {key}", "Content-Type": "application/json"},
         json=payload,
@@ -144,7 +167,7 @@ def call_deepseek(model: str, system: Optional[str], user_input: str, temperatur
     except Exception:
         text = ""
 
-    return text, data
+    return text, (data if include_raw else None)
 
 
 @app.post("/llm", response_model=LLMResp)
@@ -152,11 +175,11 @@ def llm(req: LLMReq):
     t0 = time.time()
     try:
         if req.provider == "openai":
-            text, raw = call_openai(req.model, req.system, req.input, req.temperature, req.max_tokens)
+            text, raw = call_openai(req.model, req.system, req.input, req.temperature, req.max_tokens, bool(req.include_raw))
         elif req.provider == "gemini":
-            text, raw = call_gemini(req.model, req.system, req.input, req.temperature, req.max_tokens)
+            text, raw = call_gemini(req.model, req.system, req.input, req.temperature, req.max_tokens, bool(req.include_raw))
         elif req.provider == "deepseek":
-            text, raw = call_deepseek(req.model, req.system, req.input, req.temperature, req.max_tokens)
+            text, raw = call_deepseek(req.model, req.system, req.input, req.temperature, req.max_tokens, bool(req.include_raw))
         else:
             raise HTTPException(400, "Unknown provider")
 
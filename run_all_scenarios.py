@@ -4,13 +4,18 @@ Batch runner for all scenarios in scenarios.json.
 Executes each test case and aggregates results.
 """
 
+import argparse
 import json
 import subprocess
 import sys
 import os
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+import run_trail
+
 
 def check_backend_health(backend_url: str) -> bool:
     """Check if the backend simulator is running and responsive."""
@@ -70,8 +75,56 @@ def load_scenarios(path: str):
         return json.load(f)
 
 
+def scenario_banner(scenario) -> str:
+    case_id = scenario.get('case_id') or scenario.get('id', 'unknown')
+    return (
+        f"\n{'='*60}\n"
+        f"Running scenario: {case_id}\n"
+        f"Category: {scenario.get('category', 'N/A')}\n"
+        f"Query: {scenario.get('query', 'N/A')[:80]}...\n"
+        f"{'='*60}"
+    )
+
+
+def run_scenario_inprocess(scenario, backend_url, llm_parse_url, root_dir, scenarios_path, state_lock, ctx):
+    """
+    Run a single scenario via run_trail.run_once in this process.
+    Returns (ok, metrics or None, captured log text); the caller writes
+    results. As with a run_trail.py process exiting 0, a scenario whose
+    start/goal can't be resolved is skipped (ok, no metrics), not failed.
+    """
+    case_id = scenario.get('case_id') or scenario.get('id', 'unknown')
+    lines = [scenario_banner(scenario)]
+
+    def log(*args):
+        lines.append(" ".join(str(a) for a in args))
+
+    try:
+        metrics = run_trail.run_once(
+            backend=backend_url,
+            scenario_id=case_id,
+            user_from_scenarios=scenarios_path,
+            post_scenario=True,
+            llm_parse=llm_parse_url,
+            root=root_dir,
+            out=None,
+            state_lock=state_lock,
+            log=log,
+            ctx=ctx,
+        )
+    except Exception as e:
+        lines.append(f"❌ Scenario {case_id} failed with exception: {e}")
+        return False, None, "\n".join(lines)
+
+    if metrics is None:
+        lines.append(f"⚠️  Scenario {case_id} skipped: could not resolve start/goal")
+    else:
+        lines.append(f"✅ Scenario {case_id} completed successfully")
+    return True, metrics, "\n".join(lines)
+
+
 def run_scenario(scenario, backend_url, llm_parse_url, root_dir, scenarios_path):
-    """Run a single scenario using run_trail.py."""
+    """Run a single scenario using run_trail.py in a subprocess (--subprocess)."""
     case_id = scenario.get('case_id') or scenario.get('id', 'unknown')
     
     cmd = [
@@ -83,14 +136,10 @@ def run_scenario(scenario, backend_url, llm_parse_url, root_dir, scenarios_path)
         '--post-scenario',
         '--llm-parse', llm_parse_url,
         '--root', root_dir,
-        '--out', 'tools/trial_results.json'
+        '--out', 'tools/trial_results.jsonl'
     ]
     
-    print(f"\n{'='*60}")
-    print(f"Running scenario: {case_id}")
-    print(f"Category: {scenario.get('category', 'N/A')}")
-    print(f"Query: {scenario.get('query', 'N/A')[:80]}...")
-    print(f"{'='*60}")
+    print(scenario_banner(scenario))
     
     try:
         result = subprocess.run(
@@ -128,12 +177,16 @@ def main():
     llm_parse_url = 'http://127.0.0.1:5001/parse'
     
     # Allow overrides via command line arguments
-    if len(sys.argv) > 1:
-        scenarios_path = sys.argv[1]
-    if len(sys.argv) > 2:
-        backend_url = sys.argv[2]
-    if len(sys.argv) > 3:
-        llm_parse_url = sys.argv[3]
+    p = argparse.ArgumentParser(description=__doc__)
+    p.add_argument("scenarios_path", nargs="?", default=scenarios_path)
+    p.add_argument("backend_url", nargs="?", default=backend_url)
+    p.add_argument("llm_parse_url", nargs="?", default=llm_parse_url)
+    p.add_argument("--workers", type=int, default=8, help="Scenarios run concurrently (in-process mode)")
+    p.add_argument("--subprocess", action="store_true", help="Run each scenario as a separate run_trail.py process, one at a time")
+    args = p.parse_args()
+    scenarios_path = args.scenarios_path
+    backend_url = args.backend_url
+    llm_parse_url = args.llm_parse_url
     
     print(f"Loading scenarios from: {scenarios_path}")
     print(f"Backend URL: {backend_url}")
@@ -176,9 +229,9 @@ def main():
     print(f"\nFound {total} scenarios to run\n")
     
     # Clear or backup previous results
-    results_path = os.path.join(root_dir, 'tools', 'trial_results.json')
+    results_path = os.path.join(root_dir, 'tools', 'trial_results.jsonl')
     if os.path.exists(results_path):
-        backup_path = results_path.replace('.json', f'.backup.{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+        backup_path = results_path.replace('.jsonl', f'.backup.{datetime.now().strftime("%Y%m%d_%H%M%S")}.jsonl')
         os.rename(results_path, backup_path)
         print(f"Backed up existing results to: {backup_path}\n")
     
@@ -187,12 +240,35 @@ def main():
     success_count = 0
     failure_count = 0
     
-    for i, scenario in enumerate(scenarios, 1):
-        print(f"\n[{i}/{total}] Processing scenario...")
-        if run_scenario(scenario, backend_url, llm_parse_url, root_dir, scenarios_path):
-            success_count += 1
-        else:
-            failure_count += 1
+    if args.subprocess:
+        for i, scenario in enumerate(scenarios, 1):
+            print(f"\n[{i}/{total}] Processing scenario...")
+            if run_scenario(scenario, backend_url, llm_parse_url, root_dir, scenarios_path):
+                success_count += 1
+            else:
+                failure_count += 1
+    elif total:
+        # Trials are network-bound; LLM parses overlap while the backend's
+        # single live state is only touched by one trial at a time.
+        state_lock = threading.Lock()
+        # every trial posts its own snapshot, so only the length map is shared
+        ctx = run_trail.build_ctx(backend_url, root_dir, reuse_snapshot=False)
+        with ThreadPoolExecutor(max_workers=max(1, min(args.workers, total))) as ex:
+            futures = [
+                ex.submit(run_scenario_inprocess, scenario, backend_url, llm_parse_url, root_dir, scenarios_path, state_lock, ctx)
+                for scenario in scenarios
+            ]
+            # collected in scenario order so output and results file match a sequential run
+            for i, fut in enumerate(futures, 1):
+                ok, metrics, text = fut.result()
+                print(f"\n[{i}/{total}] Processing scenario...")
+                print(text)
+                if not ok:
+                    failure_count += 1
+                    continue
+                if metrics is not None:
+                    run_trail.append_metrics(results_path, metrics)
+                success_count += 1
     
     # Summary
     end_time = datetime.now()
@@ -1,37 +1,393 @@
 import argparse
+import concurrent.futures
+import contextlib
 import json
 import os
 import time
+import dataclasses
 import datetime
+import functools
+import itertools
+import threading
+import traceback
+import numpy as np
 import requests
-from typing import List
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
 
+try:
+    # bit-parallel C++ edit distance / LCS; the NumPy / pure-Python versions below are the fallback
+    from rapidfuzz.distance import LCSseq as _RF_LCSseq, Levenshtein as _RF_Levenshtein
+except ImportError:
+    _RF_LCSseq = _RF_Levenshtein = None
 
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
+
+_NB_LEV = _NB_LEV64 = _NB_LCS = _NB_LCS64 = None
+if _RF_Levenshtein is None:
+    try:
+        # compiled DP kernels when rapidfuzz is missing; NumPy / pure Python otherwise
+        from numba import njit
+    except ImportError:
+        njit = None
+
+    if njit is not None:
+        # eager signatures: compiled (or loaded from the on-disk cache) once at
+        # import; nogil so run_all_scenarios' worker threads compute metrics in parallel
+        @njit("int32(int32[::1], int32[::1], int32)", cache=True, nogil=True, boundscheck=False)
+        def _lev_int(a, b, max_dist):
+            # Ukkonen band: only cells with |i - j| <= max_dist can stay within
+            # the bound; everything else is clamped to max_dist + 1
+            n = a.shape[0]
+            m = b.shape[0]
+            big = max_dist + 1
+            prev = np.empty(m + 1, dtype=np.int32)
+            cur = np.empty(m + 1, dtype=np.int32)
+            for j in range(m + 1):
+                prev[j] = j if j < big else big
+            for i in range(1, n + 1):
+                lo = max(1, i - max_dist)
+                hi = min(m, i + max_dist)
+                cur[0] = i if i < big else big
+                if lo > 1:
+                    cur[lo - 1] = big
+                row_min = cur[0] if lo == 1 else big
+                ai = a[i - 1]
+                for j in range(lo, hi + 1):
+                    best = prev[j - 1] + (0 if b[j - 1] == ai else 1)
+                    if prev[j] + 1 < best:
+                        best = prev[j] + 1
+                    if cur[j - 1] + 1 < best:
+                        best = cur[j - 1] + 1
+                    if best > big:
+                        best = big
+                    cur[j] = best
+                    if best < row_min:
+                        row_min = best
+                if hi < m:
+                    cur[hi + 1] = big
+                # row minima never decrease, so the bound is already exceeded
+                if row_min > max_dist:
+                    return max_dist
+                prev, cur = cur, prev
+            return min(prev[m], max_dist)
+
+        @njit("int32(int32[::1], int32[::1])", cache=True, nogil=True, boundscheck=False)
+        def _lev_myers64(a, b):
+            # _myers_lev with b (at most 64 codes) packed into one uint64 word
+            m = b.shape[0]
+            top = 0
+            for j in range(m):
+                top = max(top, b[j])
+            one = np.uint64(1)
+            peq = np.zeros(top + 1, dtype=np.uint64)
+            for j in range(m):
+                peq[b[j]] |= one << np.uint64(j)
+            mask = ~np.uint64(0) if m == 64 else (one << np.uint64(m)) - one
+            last = one << np.uint64(m - 1)
+            vp = mask
+            vn = np.uint64(0)
+            score = m
+            for i in range(a.shape[0]):
+                c = a[i]
+                x = (peq[c] if c <= top else np.uint64(0)) | vn
+                d0 = (((x & vp) + vp) ^ vp) | x
+                hp = vn | ~(d0 | vp)
+                hn = vp & d0
+                if hp & last:
+                    score += 1
+                elif hn & last:
+                    score -= 1
+                x = (hp << one) | one
+                vn = x & d0 & mask
+                vp = ((hn << one) | ~(x | d0)) & mask
+            return score
+
+        @njit("int32(int32[::1], int32[::1])", cache=True, nogil=True, boundscheck=False)
+        def _lcs_bit64(a, b):
+            # lcs_len's bit-parallel recurrence with b (at most 64 codes) in one uint64
+            m = b.shape[0]
+            top = 0
+            for j in range(m):
+                top = max(top, b[j])
+            one = np.uint64(1)
+            peq = np.zeros(top + 1, dtype=np.uint64)
+            for j in range(m):
+                peq[b[j]] |= one << np.uint64(j)
+            mask = ~np.uint64(0) if m == 64 else (one << np.uint64(m)) - one
+            v = mask
+            for i in range(a.shape[0]):
+                c = a[i]
+                if c <= top:
+                    u = v & peq[c]
+                    v = ((v + u) | (v - u)) & mask
+            zeros = 0
+            for j in range(m):
+                if not (v >> np.uint64(j)) & one:
+                    zeros += 1
+            return zeros
+
+        @njit("int32(int32[::1], int32[::1])", cache=True, nogil=True, boundscheck=False)
+        def _lcs_int(a, b):
+            # one rolling row; `diag` carries the previous row's dp[j]
+            m = b.shape[0]
+            dp = np.zeros(m + 1, dtype=np.int32)
+            for i in range(a.shape[0]):
+                ai = a[i]
+                diag = 0
+                for j in range(m):
+                    up = dp[j + 1]
+                    if b[j] == ai:
+                        dp[j + 1] = diag + 1
+                    elif dp[j] > up:
+                        dp[j + 1] = dp[j]
+                    diag = up
+            return dp[m]
+
+        _NB_LEV, _NB_LEV64, _NB_LCS, _NB_LCS64 = _lev_int, _lev_myers64, _lcs_int, _lcs_bit64
+
+
+# one keep-alive session for every backend / LLM call (also shared by the
+# threads of run_all_scenarios)
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
+
+def post_json(url: str, payload: Any, timeout: float) -> requests.Response:
+    """POST a JSON body, encoded with orjson when available."""
+    if orjson is not None:
+        return SESSION.post(url, data=orjson.dumps(payload), headers={"Content-Type": "application/json"}, timeout=timeout)
+    return SESSION.post(url, json=payload, timeout=timeout)
+
+
+def response_json(r: requests.Response):
+    return orjson.loads(r.content) if orjson is not None else r.json()
+
+
+_PRINT_LOCK = threading.Lock()
+
+
+def locked_print(*args):
+    """print() that keeps lines from concurrent trial threads whole."""
+    with _PRINT_LOCK:
+        print(*args)
+
+
+@functools.lru_cache(maxsize=1 << 16)
 def normalize(s: str) -> str:
+    # node ids repeat across every route and trial; cache the strip/upper
     return (s or "").strip().upper()
 
 
+@functools.lru_cache(maxsize=1 << 16)
 def backend_edge_id(a: str, b: str) -> str:
+    # the same hops recur across trials (and in both directions of the length map)
     return f"{normalize(a)}__{normalize(b)}"
 
 
 def read_json(path: str):
+    """
+    Parsed JSON, cached per (path, mtime) so repeated trials in one process
+    don't re-read unchanged files. Callers must not mutate the result.
+    """
+    return _read_json_cached(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=8)
+def _read_json_cached(path: str, mtime_ns: int):
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
 
-def post_state(backend: str, state_payload: dict):
+@contextlib.contextmanager
+def phase(name: str, sink: Dict[str, float]):
+    """Adds the wall time of the block, in ms, to sink[name]."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        sink[name] = sink.get(name, 0.0) + (time.perf_counter() - t0) * 1000.0
+
+
+def index_scenarios(scenarios) -> Dict[str, dict]:
+    """
+    {scenario id: entry} for a scenarios list or dict. Dict keys win, then
+    `id` / `case_id` of each entry; the first entry with a given id wins,
+    same as a front-to-back scan. Ids are keyed as str(), matching the CLI's
+    --scenario-id and the offsets sidecar after its JSON round trip.
+    """
+    by_id: Dict[str, dict] = {}
+    if isinstance(scenarios, dict):
+        for k, v in scenarios.items():
+            if v:
+                by_id[k] = v
+        entries = scenarios.values()
+    else:
+        entries = scenarios
+    for v in entries:
+        if not isinstance(v, dict):
+            continue
+        for k in (v.get("id"), v.get("case_id")):
+            if k is not None:
+                by_id.setdefault(str(k), v)
+    return by_id
+
+
+def load_scenario_index(path: str) -> Dict[str, dict]:
+    return _scenario_index_cached(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _scenario_index_cached(path: str, mtime_ns: int) -> Dict[str, dict]:
+    return index_scenarios(read_json(path))
+
+
+def resolve_scenario(path: Optional[str], scenario_id: Optional[str]) -> Tuple[Optional[dict], Optional[Exception]]:
+    """
+    (entry, None) for the scenario a trial refers to, (None, None) if no
+    scenario was requested or the id is unknown, and (None, error) if the
+    file could not be read, so callers can report it where it matters.
+    """
+    if not path or not scenario_id:
+        return None, None
+    try:
+        return load_scenario(path, scenario_id), None
+    except Exception as e:
+        return None, e
+
+
+# -----------------------------
+# Scenario offsets sidecar (scenarios.json -> scenarios.index.json)
+# -----------------------------
+def scenario_offsets_path(path: str) -> str:
+    root, _ = os.path.splitext(path)
+    return root + ".index.json"
+
+
+def build_scenario_offsets(path: str) -> Optional[Dict[str, List[int]]]:
+    """
+    {scenario id: [byte offset, byte length]} of each entry in a scenarios
+    list, keyed like index_scenarios (str ids, the same before and after the
+    sidecar's JSON round trip). None if the file is not a JSON array.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    text = raw.decode("utf-8")
+    decoder = json.JSONDecoder()
+    ws = " \t\r\n"
+
+    i = len(text) - len(text.lstrip(ws))
+    if not text.startswith("[", i):
+        return None
+    i += 1
+    offsets: Dict[str, List[int]] = {}
+    char_pos = byte_pos = 0     # last char offset converted to bytes
+    while True:
+        while i < len(text) and text[i] in ws:
+            i += 1
+        if i >= len(text) or text[i] == "]":
+            break
+        entry, end = decoder.raw_decode(text, i)
+        start_byte = byte_pos + len(text[char_pos:i].encode("utf-8"))
+        end_byte = start_byte + len(text[i:end].encode("utf-8"))
+        char_pos, byte_pos = end, end_byte
+        if isinstance(entry, dict):
+            for k in (entry.get("id"), entry.get("case_id")):
+                if k is not None and str(k) not in offsets:
+                    offsets[str(k)] = [start_byte, end_byte - start_byte]
+        i = end
+        while i < len(text) and text[i] in ws:
+            i += 1
+        if i < len(text) and text[i] == ",":
+            i += 1
+    return offsets
+
+
+@functools.lru_cache(maxsize=4)
+def _scenario_offsets_cached(path: str, mtime_ns: int, size: int) -> Optional[Dict[str, List[int]]]:
+    """
+    Offsets from the sidecar if it matches the source's mtime/size,
+    otherwise rebuilt with one full parse and written back.
+    """
+    sidecar = scenario_offsets_path(path)
+    try:
+        index = read_json(sidecar)
+        if index.get("source_mtime_ns") == mtime_ns and index.get("source_size") == size:
+            return index.get("offsets")
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    offsets = build_scenario_offsets(path)
+    if offsets is not None:
+        index = {"source_mtime_ns": mtime_ns, "source_size": size, "offsets": offsets}
+        try:
+            tmp = f"{sidecar}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+            os.replace(tmp, sidecar)
+        except OSError:
+            pass    # read-only checkout: keep the in-memory offsets only
+    return offsets
+
+
+def load_scenario(path: str, scenario_id: str) -> Optional[dict]:
+    """
+    One scenario entry by id. Array files are read through the offsets
+    sidecar (seek + parse of that entry only); other layouts fall back to
+    the full in-memory index.
+    """
+    scenario_id = str(scenario_id)
+    st = os.stat(path)
+    offsets = _scenario_offsets_cached(path, st.st_mtime_ns, st.st_size)
+    if offsets is None:
+        return load_scenario_index(path).get(scenario_id)
+    span = offsets.get(scenario_id)
+    if span is None:
+        return None
+    start, length = span
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(length)
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def post_state_update(backend: str, state_payload: dict):
     url = backend.rstrip("/") + "/api/state/update"
-    r = requests.post(url, json=state_payload, timeout=10)
+    r = post_json(url, state_payload, timeout=10)
     r.raise_for_status()
     return r
 
 
+def posted_state_view(payload: dict) -> dict:
+    """
+    The edges state /api/state reports right after post_state_update(payload):
+    the backend stores the posted edges as-is, mirrored onto the reverse
+    direction unless mirrorUndirected is false (see app.api_state_update).
+    """
+    edges = payload.get("edges", {})
+    mirror = payload.get("mirrorUndirected", True)
+    out = {}
+    for eid, st in edges.items():
+        out[eid] = st
+        if mirror:
+            a, sep, b = eid.partition("__")
+            if sep:
+                out[f"{b}__{a}"] = st
+    return {"graphVersion": payload.get("graphVersion"), "edges": out}
+
+
 def snapshot_state(backend: str) -> dict:
     url = backend.rstrip("/") + "/api/state"
-    r = requests.get(url, timeout=10)
+    r = SESSION.get(url, timeout=10)
     r.raise_for_status()
-    return r.json()
+    return response_json(r)
 
 
 def call_route(backend: str, start: str, goal: str, *, constraints: dict, weights: dict):
@@ -43,152 +399,310 @@ def call_route(backend: str, start: str, goal: str, *, constraints: dict, weight
         "constraints": constraints or {},
         "weights": weights or {},
     }
-    r = requests.post(url, json=payload, timeout=15)
+    r = post_json(url, payload, timeout=15)
     r.raise_for_status()
-    return r.json()
+    return response_json(r)
 
 
 def parse_user_with_llm(llm_url: str, start: str, goal: str, user_sentence: str):
     payload = {"start": start, "goal": goal, "user": user_sentence}
-    r = requests.post(llm_url, json=payload, timeout=30)
+    r = post_json(llm_url, payload, timeout=30)
     r.raise_for_status()
-    return r.json()
+    return response_json(r)
+
+
+def _edges_to_nodes(edges: Any) -> Optional[List[str]]:
+    """Node path of "A__B" edge ids; malformed ids are skipped."""
+    if not isinstance(edges, list):
+        return None
+    it = iter(edges)
+    # the first well-formed id supplies both endpoints ...
+    for e in it:
+        u, sep, v = e.partition("__")
+        if sep and "__" not in v:
+            nodes = [u, v]
+            break
+    else:
+        return None
+    # ... every later one only its head
+    for e in it:
+        _, sep, v = e.partition("__")
+        if sep and "__" not in v:
+            nodes.append(v)
+    return nodes
+
+
+def _node_list(nodes: Any) -> Optional[List[str]]:
+    return nodes if isinstance(nodes, list) else None
+
+
+def _nested_nodes(route: Any) -> Optional[List[str]]:
+    return route.get("nodes") if isinstance(route, dict) else None
+
+
+# response keys in order of preference; an extractor returning None falls
+# through to the next key
+_NODE_EXTRACTORS: Tuple[Tuple[str, Callable[[Any], Optional[List[str]]]], ...] = (
+    ("pathNodes", _node_list),
+    ("pathEdges", _edges_to_nodes),
+    ("nodes", _node_list),
+    ("route", _nested_nodes),
+    ("edges", _edges_to_nodes),
+)
 
 
 def route_nodes_from_response(resp: dict) -> List[str]:
-    if not resp:
+    if not resp or not isinstance(resp, dict):
         return []
-    if isinstance(resp, dict):
-        if "pathNodes" in resp and isinstance(resp["pathNodes"], list):
-            return resp["pathNodes"]
-        if "pathEdges" in resp and isinstance(resp["pathEdges"], list):
-            nodes = []
-            for e in resp["pathEdges"]:
-                parts = e.split("__")
-                if len(parts) == 2:
-                    if not nodes:
-                        nodes.append(parts[0])
-                    nodes.append(parts[1])
-            if nodes:
+    for key, extract in _NODE_EXTRACTORS:
+        value = resp.get(key)
+        if value is not None:
+            nodes = extract(value)
+            if nodes is not None:
                 return nodes
-        if "nodes" in resp and isinstance(resp["nodes"], list):
-            return resp["nodes"]
-        if "route" in resp and isinstance(resp["route"], dict) and "nodes" in resp["route"]:
-            return resp["route"]["nodes"]
-        if "edges" in resp and isinstance(resp["edges"], list):
-            nodes = []
-            for e in resp["edges"]:
-                parts = e.split("__")
-                if len(parts) == 2:
-                    if not nodes:
-                        nodes.append(parts[0])
-                    nodes.append(parts[1])
-            return nodes
     return []
 
 
-def edges_from_nodes(nodes: List[str]) -> List[str]:
-    return [backend_edge_id(a, b) for a, b in zip(nodes, nodes[1:])]
+def edges_from_nodes(nodes: List[str], edge_ids: Optional[Dict[Tuple[str, str], str]] = None) -> List[str]:
+    """
+    Edge ids along a node path. With a shared `edge_ids` interner, pairs
+    already seen (e.g. the prefix GT and LLM routes have in common) reuse
+    the id string built the first time.
+    """
+    if edge_ids is None:
+        return [backend_edge_id(a, b) for a, b in zip(nodes, nodes[1:])]
+    out = []
+    for pair in zip(nodes, nodes[1:]):
+        eid = edge_ids.get(pair)
+        if eid is None:
+            eid = edge_ids[pair] = backend_edge_id(*pair)
+        out.append(eid)
+    return out
+
+
+EdgeSeq = Union[Sequence[str], np.ndarray]
+
+
+def encode_edges(edges: EdgeSeq, codec: Dict[str, int]) -> np.ndarray:
+    """
+    Map edge ids to int32 codes, adding unseen ids to `codec`.
+    Sequences encoded with the same codec compare equal iff their ids do.
+    """
+    if isinstance(edges, np.ndarray):
+        return edges
+    return np.fromiter((codec.setdefault(e, len(codec)) for e in edges), dtype=np.int32, count=len(edges))
 
 
-def levenshtein(a: List[str], b: List[str]) -> int:
+def levenshtein(a: EdgeSeq, b: EdgeSeq, codec: Optional[Dict[str, int]] = None, max_dist: Optional[int] = None) -> int:
+    """
+    Edit distance between edge id lists or int codes from encode_edges,
+    bit-parallel (_myers_lev) unless rapidfuzz or the numba kernels are
+    available. With `max_dist`, returns min(distance, max_dist) and stops as soon as
+    the bound is known to be exceeded.
+    """
     n, m = len(a), len(b)
+    if max_dist is None or max_dist >= max(n, m):
+        max_dist = max(n, m)   # never binding
+    elif abs(n - m) >= max_dist:
+        return max_dist
     if n == 0:
         return m
     if m == 0:
         return n
-    dp = list(range(m + 1))
-    for i in range(1, n + 1):
-        prev = dp[:]
-        dp[0] = i
-        ai = a[i - 1]
-        for j in range(1, m + 1):
-            cost = 0 if ai == b[j - 1] else 1
-            dp[j] = min(prev[j] + 1, dp[j - 1] + 1, prev[j - 1] + cost)
-    return dp[m]
-
-
-def lcs_len(a: List[str], b: List[str]) -> int:
-    n, m = len(a), len(b)
-    dp = [[0] * (m + 1) for _ in range(n + 1)]
-    for i in range(n - 1, -1, -1):
-        for j in range(m - 1, -1, -1):
-            if a[i] == b[j]:
-                dp[i][j] = 1 + dp[i + 1][j + 1]
-            else:
-                dp[i][j] = max(dp[i + 1][j], dp[i][j + 1])
-    return dp[0][0]
+    codec = {} if codec is None else codec
+    a_int = encode_edges(a, codec)
+    b_int = encode_edges(b, codec)
+    if _RF_Levenshtein is not None:
+        return min(int(_RF_Levenshtein.distance(a_int.tolist(), b_int.tolist(), score_cutoff=max_dist)), max_dist)
+    # the distance is symmetric: keep the shorter sequence as the bit pattern
+    if n < m:
+        a_int, b_int = b_int, a_int
+    if _NB_LEV is not None:
+        a_c = np.ascontiguousarray(a_int, dtype=np.int32)
+        b_c = np.ascontiguousarray(b_int, dtype=np.int32)
+        if len(b_c) <= 64:
+            return min(int(_NB_LEV64(a_c, b_c)), max_dist)
+        return int(_NB_LEV(a_c, b_c, max_dist))
+    return min(_myers_lev(a_int.tolist(), b_int.tolist()), max_dist)
+
+
+def _myers_lev(a: Sequence[int], b: Sequence[int]) -> int:
+    """
+    Edit distance by Myers/Hyyro bit-parallel DP: one column of the DP
+    matrix over `b` is kept as vertical +1/-1 delta bitmasks (vp/vn), so each
+    element of `a` costs a handful of big-int operations instead of a row.
+    """
+    m = len(b)
+    peq: Dict[int, int] = {}
+    for j, c in enumerate(b):
+        peq[c] = peq.get(c, 0) | (1 << j)
+    mask = (1 << m) - 1
+    last = 1 << (m - 1)
+    vp, vn, score = mask, 0, m
+    for c in a:
+        x = peq.get(c, 0) | vn
+        d0 = (((x & vp) + vp) ^ vp) | x
+        hp = vn | (~(d0 | vp) & mask)
+        hn = vp & d0
+        if hp & last:
+            score += 1
+        elif hn & last:
+            score -= 1
+        x = ((hp << 1) | 1) & mask
+        vn = x & d0
+        vp = ((hn << 1) | ~(x | d0)) & mask
+    return score
+
+
+def lcs_len(a: EdgeSeq, b: EdgeSeq) -> int:
+    """
+    Longest common subsequence length, bit-parallel (Allison-Dix / Hyyro):
+    the zero bits of `v` mark the b-positions where the LCS grows, and each
+    element of `a` updates all of them with one add and a few bit ops.
+    """
+    if _RF_LCSseq is None and _NB_LCS is not None and isinstance(a, np.ndarray) and isinstance(b, np.ndarray):
+        a_c = np.ascontiguousarray(a, dtype=np.int32)
+        b_c = np.ascontiguousarray(b, dtype=np.int32)
+        if len(a_c) < len(b_c):
+            a_c, b_c = b_c, a_c
+        if 0 < len(b_c) <= 64:
+            return int(_NB_LCS64(a_c, b_c))
+        return int(_NB_LCS(a_c, b_c))
+    if isinstance(a, np.ndarray):
+        a = a.tolist()
+    if isinstance(b, np.ndarray):
+        b = b.tolist()
+    if _RF_LCSseq is not None:
+        return int(_RF_LCSseq.similarity(a, b))
+    if len(a) < len(b):
+        a, b = b, a   # shorter sequence as the bit pattern
+    m = len(b)
+    peq: Dict[Any, int] = {}
+    for j, c in enumerate(b):
+        peq[c] = peq.get(c, 0) | (1 << j)
+    mask = (1 << m) - 1
+    v = mask
+    for c in a:
+        u = v & peq.get(c, 0)
+        v = ((v + u) | (v - u)) & mask
+    return m - v.bit_count()
+
 
+def code_bits(codes: np.ndarray) -> int:
+    """Set of edge codes as an int bitmask (bit c set for code c)."""
+    bits = 0
+    for c in codes.tolist():
+        bits |= 1 << c
+    return bits
 
-def jaccard(a: List[str], b: List[str]) -> float:
-    sa, sb = set(a), set(b)
-    if not sa and not sb:
+
+def jaccard_codes(a: np.ndarray, b: np.ndarray) -> float:
+    """Jaccard similarity of two routes' edge sets, as popcounts of code bitmasks."""
+    bits_a, bits_b = code_bits(a), code_bits(b)
+    inter = (bits_a & bits_b).bit_count()
+    uni = bits_a.bit_count() + bits_b.bit_count() - inter
+    if uni == 0:
         return 1.0
-    inter = sa.intersection(sb)
-    uni = sa.union(sb)
-    return len(inter) / len(uni)
+    return inter / uni
+
+
+_EMPTY: dict = {}
 
 
-def compute_travel_time(edges: List[str], state: dict, length_map: dict) -> float:
-    t = 0.0
-    for e in edges:
-        s = state.get("edges", {}).get(e, {})
-        speed = float(s.get("speedFactor", 1.0))
-        length = float(length_map.get(e, 1.0))
-        t += length / max(1e-6, speed)
-    return t
+# rows of the edge_attr_arrays table
+ATTR_TIME, ATTR_HAZARD, ATTR_LENGTH = 0, 1, 2
 
 
-def compute_total_risk(edges: List[str], state: dict) -> float:
-    """Calculate total risk (sum of hazard levels) across all edges."""
-    risk = 0.0
-    for e in edges:
-        s = state.get("edges", {}).get(e, {})
-        risk += float(s.get("hazardLevel", 0.0))
-    return risk
+def edge_attr_arrays(codec: Dict[str, int], edges_state: dict, length_map: dict) -> np.ndarray:
+    """
+    (3, n) table of travel time / hazard level / length per edge code, one
+    state lookup per distinct edge. Missing edges count as length 1.0,
+    speedFactor 1.0 and hazardLevel 0.0; travel time is length / speedFactor
+    with the speed floored at 1e-6.
+    """
+    n = len(codec)
+    table = np.empty((3, n), dtype=np.float64)
+    speed = np.empty(n, dtype=np.float64)
+    # encode_edges assigns codes 0..n-1 in insertion order, so iterating the
+    # codec visits codes in order and the length row fills in one call
+    table[ATTR_LENGTH] = np.fromiter(map(length_map.get, codec, itertools.repeat(1.0, n)), dtype=np.float64, count=n)
+    # bound once: the loop runs per distinct edge of every trial
+    state_get = edges_state.get
+    hazard = table[ATTR_HAZARD]
+    for e, c in codec.items():
+        s = state_get(e, _EMPTY)
+        hazard[c] = float(s.get("hazardLevel", 0.0))
+        speed[c] = float(s.get("speedFactor", 1.0))
+    np.divide(table[ATTR_LENGTH], np.where(speed > 1e-6, speed, 1e-6), out=table[ATTR_TIME])
+    return table
 
 
-def compute_total_distance(edges: List[str], length_map: dict) -> float:
-    """Calculate total distance (sum of edge lengths) across all edges."""
-    distance = 0.0
-    for e in edges:
-        distance += float(length_map.get(e, 1.0))
-    return distance
+def route_stats(codes: np.ndarray, table: np.ndarray) -> Tuple[float, float, float, int]:
+    """
+    (travel time, total risk, total distance, edges with hazardLevel > 0.3)
+    for a route given as edge codes: one gather of all three rows of the
+    edge_attr_arrays table, summed left to right so totals match a plain
+    running sum (np.sum's pairwise order can differ in the last bit).
+    """
+    if not len(codes):
+        return 0.0, 0.0, 0.0, 0
+    rows = table[:, codes]
+    time_s, risk, distance = np.cumsum(rows, axis=1)[:, -1].tolist()
+    return time_s, risk, distance, int(np.count_nonzero(rows[ATTR_HAZARD] > 0.3))
 
 
 def build_length_map_from_data(root_dir: str) -> dict:
     path = os.path.join(root_dir, "data", "edges.json")
     if not os.path.exists(path):
         return {}
+    return _length_map_cached(path, os.stat(path).st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=4)
+def _length_map_cached(path: str, mtime_ns: int) -> dict:
+    # lengths are coerced to float once here, so readers can use them as-is
     data = read_json(path)
     out = {}
     if isinstance(data, dict):
         for k, v in data.items():
-            out[k] = v.get("length", 1.0) if isinstance(v, dict) else 1.0
+            out[k] = float(v.get("length", 1.0)) if isinstance(v, dict) else 1.0
     elif isinstance(data, list):
         for e in data:
             a = e.get("from") or e.get("a") or e.get("u")
             b = e.get("to") or e.get("b") or e.get("v")
             if a and b:
-                eid = backend_edge_id(a, b)
-                out[eid] = e.get("length", 1.0)
-                out[backend_edge_id(b, a)] = e.get("length", 1.0)
+                length = float(e.get("length", 1.0))
+                out[backend_edge_id(a, b)] = length
+                out[backend_edge_id(b, a)] = length
     return out
 
 
+def utc_timestamp() -> str:
+    """Current UTC time as ISO 8601 with a "Z" suffix (utcnow() is deprecated since 3.12)."""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat().replace("+00:00", "Z")
+
+
 def compute_metrics(gt_nodes, llm_nodes, state_snapshot, length_map, gt_constraints=None, gt_weights=None, llm_constraints=None, llm_weights=None, gt_category=None, llm_category=None):
-    gt_edges = edges_from_nodes(gt_nodes)
-    llm_edges = edges_from_nodes(llm_nodes)
-    lev = levenshtein(gt_edges, llm_edges)
-    lcs = lcs_len(gt_edges, llm_edges)
-    jac = jaccard(gt_edges, llm_edges)
-    gt_time = compute_travel_time(gt_edges, state_snapshot, length_map)
-    llm_time = compute_travel_time(llm_edges, state_snapshot, length_map)
-    hazards_in_llm = sum(1 for e in llm_edges if state_snapshot.get("edges", {}).get(e, {}).get("hazardLevel", 0) > 0.3)
-    gt_risk = compute_total_risk(gt_edges, state_snapshot)
-    llm_risk = compute_total_risk(llm_edges, state_snapshot)
-    gt_distance = compute_total_distance(gt_edges, length_map)
-    llm_distance = compute_total_distance(llm_edges, length_map)
+    edge_ids: Dict[Tuple[str, str], str] = {}
+    gt_edges = edges_from_nodes(gt_nodes, edge_ids)
+    llm_edges = edges_from_nodes(llm_nodes, edge_ids)
+    # one codec for both routes so edge ids compare as ints
+    codec: Dict[str, int] = {}
+    gt_codes = encode_edges(gt_edges, codec)
+    llm_codes = encode_edges(llm_edges, codec)
+    if gt_edges and llm_edges:
+        lev = levenshtein(gt_codes, llm_codes)
+        lcs = lcs_len(gt_codes, llm_codes)
+        jac = jaccard_codes(gt_codes, llm_codes)
+    else:
+        # a planner call failed (empty route): the sequence metrics are trivial
+        lev = len(gt_edges) + len(llm_edges)
+        lcs = 0
+        jac = 0.0 if gt_edges or llm_edges else 1.0
+
+    table = edge_attr_arrays(codec, state_snapshot.get("edges", {}), length_map)
+    gt_time, gt_risk, gt_distance, _ = route_stats(gt_codes, table)
+    llm_time, llm_risk, llm_distance, hazards_in_llm = route_stats(llm_codes, table)
 
     # keep comparisons lightweight: record raw params and simple diffs
     gt_constraints = gt_constraints or {}
@@ -213,7 +727,7 @@ def compute_metrics(gt_nodes, llm_nodes, state_snapshot, length_map, gt_constrai
             weights_diff[k] = round(l - g, 10)  # Round to avoid floating point precision issues
 
     metrics = {
-        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "timestamp": utc_timestamp(),
         "gt_nodes": gt_nodes,
         "llm_nodes": llm_nodes,
         "gt_edges_count": len(gt_edges),
@@ -244,229 +758,302 @@ def compute_metrics(gt_nodes, llm_nodes, state_snapshot, length_map, gt_constrai
     return metrics
 
 
-def print_metrics(metrics: dict):
-    print("--- Trial Results ---")
-    print(f"GT nodes: {metrics.get('gt_nodes')}")
-    print(f"LLM nodes: {metrics.get('llm_nodes')}")
-    print(f"GT edges: {metrics.get('gt_edges_count')}  LLM edges: {metrics.get('llm_edges_count')}")
-    print(f"Levenshtein (edges): {metrics.get('levenshtein_edges')}")
-    print(f"LCS (edges): {metrics.get('lcs_edges')}  LCS_frac: {metrics.get('lcs_fraction'):.3f}")
-    print(f"Jaccard (edges): {metrics.get('jaccard_edges'):.3f}")
-    print(f"GT time: {metrics.get('gt_time'):.3f}  LLM time: {metrics.get('llm_time'):.3f}  time diff: {metrics.get('time_diff'):.3f}")
-    print(f"GT risk: {metrics.get('gt_risk'):.3f}  LLM risk: {metrics.get('llm_risk'):.3f}  risk diff: {metrics.get('risk_diff'):.3f}")
-    print(f"GT distance: {metrics.get('gt_distance'):.3f}  LLM distance: {metrics.get('llm_distance'):.3f}  distance diff: {metrics.get('distance_diff'):.3f}")
-    print(f"Hazardous edges in LLM route (>0.3): {metrics.get('hazardous_edges_in_llm')}")
-    print(f"GT category: {metrics.get('gt_category')}")
-    print(f"LLM category: {metrics.get('llm_category')}")
+def print_metrics(metrics: dict, log: Callable[..., None] = print):
+    log("--- Trial Results ---")
+    log(f"GT nodes: {metrics.get('gt_nodes')}")
+    log(f"LLM nodes: {metrics.get('llm_nodes')}")
+    log(f"GT edges: {metrics.get('gt_edges_count')}  LLM edges: {metrics.get('llm_edges_count')}")
+    log(f"Levenshtein (edges): {metrics.get('levenshtein_edges')}")
+    log(f"LCS (edges): {metrics.get('lcs_edges')}  LCS_frac: {metrics.get('lcs_fraction'):.3f}")
+    log(f"Jaccard (edges): {metrics.get('jaccard_edges'):.3f}")
+    log(f"GT time: {metrics.get('gt_time'):.3f}  LLM time: {metrics.get('llm_time'):.3f}  time diff: {metrics.get('time_diff'):.3f}")
+    log(f"GT risk: {metrics.get('gt_risk'):.3f}  LLM risk: {metrics.get('llm_risk'):.3f}  risk diff: {metrics.get('risk_diff'):.3f}")
+    log(f"GT distance: {metrics.get('gt_distance'):.3f}  LLM distance: {metrics.get('llm_distance'):.3f}  distance diff: {metrics.get('distance_diff'):.3f}")
+    log(f"Hazardous edges in LLM route (>0.3): {metrics.get('hazardous_edges_in_llm')}")
+    log(f"GT category: {metrics.get('gt_category')}")
+    log(f"LLM category: {metrics.get('llm_category')}")
     if metrics.get("constraints_diff_keys"):
-        print(f"Constraint differences: {metrics.get('constraints_diff_keys')}")
-    print(f"GT constraints: {metrics.get('gt_constraints')}")
-    print(f"LLM constraints: {metrics.get('llm_constraints')}")
-    print(f"GT weights: {metrics.get('gt_weights')}")
-    print(f"LLM weights: {metrics.get('llm_weights')}")
+        log(f"Constraint differences: {metrics.get('constraints_diff_keys')}")
+    log(f"GT constraints: {metrics.get('gt_constraints')}")
+    log(f"LLM constraints: {metrics.get('llm_constraints')}")
+    log(f"GT weights: {metrics.get('gt_weights')}")
+    log(f"LLM weights: {metrics.get('llm_weights')}")
     if metrics.get("weights_diff"):
-        print(f"Weight deltas (llm-gt): {metrics.get('weights_diff')}")
+        log(f"Weight deltas (llm-gt): {metrics.get('weights_diff')}")
+    if metrics.get("phase_ms"):
+        log("Phase timings (ms): " + "  ".join(f"{k}={v:.1f}" for k, v in metrics["phase_ms"].items()))
 
 
-def main():
-    p = argparse.ArgumentParser()
-    p.add_argument("--backend", default="http://127.0.0.1:5000")
-    p.add_argument("--state", help="Path to state JSON to post (optional)")
-    p.add_argument("--scenario-id", help="Optional scenario identifier to record")
-    p.add_argument("--user-text", help="User inquiry text to feed to the LLM/planner (literal)")
-    p.add_argument("--user-from-scenarios", help="Path to scenarios.json to extract user text by scenario id")
-    p.add_argument("--post-scenario", action="store_true", help="Post the scenario's snapshot (from --user-from-scenarios) to backend before trial")
-    p.add_argument("--user-gen", help="Optional URL to call to generate user text; expects JSON {'user': '...'}")
-    p.add_argument("--post-state", action="store_true", help="Post --state to backend before trial")
-    p.add_argument("--start", help="Start node (optional; taken from scenario if omitted)")
-    p.add_argument("--goal", help="Goal node (optional; taken from scenario if omitted)")
-    p.add_argument("--user", default="")
-    p.add_argument("--llm-parse", help="LLM parse endpoint that returns params JSON")
-    p.add_argument("--root", default=".", help="Repo root for data/edges.json")
-    p.add_argument("--out", default="tools/trial_results.json", help="Output JSON file to append metrics")
-    args = p.parse_args()
+def append_metrics(out: str, metrics: dict):
+    """
+    Append one metrics record to `out` as a JSON line (file created if missing).
+    Load all records with: [json.loads(line) for line in open(out, encoding="utf-8")]
+    """
+    if orjson is not None:
+        line = orjson.dumps(metrics) + b"\n"
+    else:
+        line = (json.dumps(metrics, ensure_ascii=False) + "\n").encode("utf-8")
+    with open(out, "ab") as f:
+        f.write(line)
+
+
+@dataclasses.dataclass
+class TrialContext:
+    """Setup shared by the trials of one batch (see build_ctx / run_many)."""
+    length_map: dict
+    state_snapshot: Optional[dict] = None   # reused only while trials post no state
+
+
+def build_ctx(backend: str, root: str, reuse_snapshot: bool) -> TrialContext:
+    """
+    Loads the length map once and, if the trials won't change the backend
+    state, takes the state snapshot once too.
+    """
+    return TrialContext(
+        length_map=build_length_map_from_data(root),
+        state_snapshot=snapshot_state(backend) if reuse_snapshot else None,
+    )
+
+
+def run_once(
+    backend: str = "http://127.0.0.1:5000",
+    state: Optional[str] = None,
+    scenario_id: Optional[str] = None,
+    user_text: Optional[str] = None,
+    user_from_scenarios: Optional[str] = None,
+    post_scenario: bool = False,
+    user_gen: Optional[str] = None,
+    post_state: bool = False,
+    start: Optional[str] = None,
+    goal: Optional[str] = None,
+    user: str = "",
+    llm_parse: Optional[str] = None,
+    root: str = ".",
+    out: Optional[str] = "tools/trial_results.jsonl",
+    state_lock=None,
+    log: Callable[..., None] = locked_print,
+    ctx: Optional[TrialContext] = None,
+) -> Optional[dict]:
+    """
+    Run one trial (same options as the CLI) and return its metrics, or None
+    if start/goal could not be resolved.
 
+    The backend holds a single live state, so everything that posts or reads
+    it runs under `state_lock` when one is given; the LLM parse happens before
+    and can overlap with other trials.
+    """
+    state_path = state
     state_snapshot = None
+    phase_ms: Dict[str, float] = {}
+
+    # the scenario entry is looked up once and shared by the steps below
+    scenario, scenario_error = resolve_scenario(user_from_scenarios, scenario_id)
+
+    # resolve start/goal from scenario if not provided; the scenario's ground
+    # truth constraints/weights/category apply only when it supplied them
+    scenario_entry = None
+    if (not start or not goal) and scenario:
+        scenario_entry = scenario
+        # prefer explicit ground_truth fields if present
+        gt = scenario.get("ground_truth") or {}
+        if not start:
+            start = gt.get("startNode") or gt.get("start") or scenario.get("start")
+        if not goal:
+            goal = gt.get("endNode") or gt.get("end") or scenario.get("goal")
 
-    if args.state and args.post_state:
-        state = read_json(args.state)
-        print("Posting provided state to backend...")
-        post_state(args.backend, state)
-    # optional: post scenario snapshot from scenarios.json
-    if args.post_scenario:
-        if args.user_from_scenarios and args.scenario_id:
+    if start and goal:
+        # prepare user text: priority --user-text > --user-from-scenarios > --user-gen > user
+        if user_text:
+            pass
+        elif user_from_scenarios and scenario_id:
+            if scenario:
+                user_text = scenario.get("user") or scenario.get("query") or scenario.get("text")
+        elif user_gen:
             try:
-                scenarios = read_json(args.user_from_scenarios)
-                s = None
-                if isinstance(scenarios, dict):
-                    s = scenarios.get(args.scenario_id)
-                    if not s:
-                        s = next((v for v in scenarios.values() if (v.get("id") == args.scenario_id or v.get("case_id") == args.scenario_id)), None)
-                else:
-                    s = next((x for x in scenarios if (x.get("id") == args.scenario_id or x.get("case_id") == args.scenario_id)), None)
-                if s and s.get("snapshot"):
-                    print(f"Posting snapshot for scenario {args.scenario_id} to backend...")
-                    post_state(args.backend, s["snapshot"])
-                else:
-                    print(f"No snapshot found for scenario {args.scenario_id} in {args.user_from_scenarios}")
-            except Exception as e:
-                print("Failed to load/post scenario snapshot:", e)
+                r = post_json(user_gen, {"start": start, "goal": goal}, timeout=10)
+                r.raise_for_status()
+                gen = response_json(r)
+                user_text = gen.get("user") or gen.get("text")
+            except Exception:
+                user_text = None
         else:
-            print("--post-scenario requires --user-from-scenarios and --scenario-id")
-    # resolve start/goal from scenario if not provided
-    start = args.start
-    goal = args.goal
-    scenario_entry = None
-    if (not start or not goal) and args.user_from_scenarios and args.scenario_id:
+            user_text = user or None
+
+        log(f"User text for LLM: {user_text}")
+
+    def parse_llm_params() -> dict:
+        if llm_parse and user_text:
+            log(f"Querying LLM parse endpoint: {llm_parse}")
+            try:
+                with phase("llm_parse", phase_ms):
+                    parsed = parse_user_with_llm(llm_parse, start, goal, user_text)
+                log(f"LLM parse response: {parsed}")
+                if not isinstance(parsed, dict):
+                    log(f"WARNING: LLM parse response is not a dict, got type: {type(parsed)}")
+                    return {}
+                return parsed
+            except Exception as e:
+                log(f"LLM parse failed with exception: {type(e).__name__}: {e}")
+                log(traceback.format_exc())
+                return {}
+        elif not llm_parse:
+            log("No --llm-parse endpoint specified, skipping LLM parsing")
+        elif not user_text:
+            log("No user text available for LLM parsing")
+        return {}
+
+    def route_nodes(kind: str, constraints: dict, weights: dict) -> List[str]:
         try:
-            scenarios = read_json(args.user_from_scenarios)
-            s = None
-            if isinstance(scenarios, dict):
-                s = scenarios.get(args.scenario_id)
-                if not s:
-                    s = next((v for v in scenarios.values() if (v.get("id") == args.scenario_id or v.get("case_id") == args.scenario_id)), None)
-            else:
-                s = next((x for x in scenarios if (x.get("id") == args.scenario_id or x.get("case_id") == args.scenario_id)), None)
-            if s:
-                scenario_entry = s
-                # prefer explicit ground_truth fields if present
-                gt = s.get("ground_truth") or {}
-                if not start:
-                    start = gt.get("startNode") or gt.get("start") or s.get("start")
-                if not goal:
-                    goal = gt.get("endNode") or gt.get("end") or s.get("goal")
-        except Exception:
-            pass
+            with phase(f"{kind}_route", phase_ms):
+                resp = call_route(backend, start, goal, constraints=constraints, weights=weights)
+            return route_nodes_from_response(resp)
+        except Exception as e:
+            log(f"Error calling {kind.upper()} planner endpoint:", e)
+            return []
 
-    if not start or not goal:
-        print("--start and --goal are required (or provide --user-from-scenarios and --scenario-id with ground_truth)")
-        return
+    # the LLM parse and the length map don't depend on backend state, so
+    # they run alongside the state / ground-truth calls
+    with concurrent.futures.ThreadPoolExecutor(max_workers=3) as ex:
+        fut_len = ex.submit(build_length_map_from_data, root) if ctx is None else None
+        fut_parse = ex.submit(parse_llm_params) if start and goal else None
+        if state_lock is not None and fut_parse is not None:
+            # batch mode: don't hold the shared backend state while the LLM answers
+            concurrent.futures.wait([fut_parse])
 
-    print("Snapshotting state from backend...")
-    state_snapshot = snapshot_state(args.backend)
+        with state_lock if state_lock is not None else contextlib.nullcontext():
+            # what the backend holds after our last successful post, if any
+            posted_state = None
+            if state_path and post_state:
+                state_payload = read_json(state_path)
+                log("Posting provided state to backend...")
+                with phase("post_state", phase_ms):
+                    post_state_update(backend, state_payload)
+                posted_state = posted_state_view(state_payload)
+            # optional: post scenario snapshot from scenarios.json
+            if post_scenario:
+                if user_from_scenarios and scenario_id:
+                    try:
+                        if scenario_error is not None:
+                            raise scenario_error
+                        if scenario and scenario.get("snapshot"):
+                            log(f"Posting snapshot for scenario {scenario_id} to backend...")
+                            with phase("post_state", phase_ms):
+                                post_state_update(backend, scenario["snapshot"])
+                            posted_state = posted_state_view(scenario["snapshot"])
+                        else:
+                            log(f"No snapshot found for scenario {scenario_id} in {user_from_scenarios}")
+                    except Exception as e:
+                        log("Failed to load/post scenario snapshot:", e)
+                        posted_state = None   # unknown whether the backend applied it
+                else:
+                    log("--post-scenario requires --user-from-scenarios and --scenario-id")
 
-    length_map = build_length_map_from_data(args.root)
+            if not start or not goal:
+                log("--start and --goal are required (or provide --user-from-scenarios and --scenario-id with ground_truth)")
+                return None
 
-    print("Calling ground-truth planner...")
-    try:
-        gt_constraints = {}
-        gt_weights = {}
-        if scenario_entry:
-            gt = scenario_entry.get("ground_truth") or {}
-            gt_constraints = gt.get("constraints") or {}
-            gt_weights = gt.get("weights") or {}
-        gt_resp = call_route(args.backend, start, goal, constraints=gt_constraints, weights=gt_weights)
-        gt_nodes = route_nodes_from_response(gt_resp)
-    except Exception as e:
-        print("Error calling GT planner endpoint:", e)
-        gt_nodes = []
-
-    # prepare user text: priority --user-text > --user-from-scenarios > --user-gen > args.user
-    user_text = None
-    if args.user_text:
-        user_text = args.user_text
-    elif args.user_from_scenarios and args.scenario_id:
-        try:
-            scenarios = read_json(args.user_from_scenarios)
-            # scenarios may be list or dict; match either `id` or `case_id`
-            s = None
-            if isinstance(scenarios, dict):
-                s = scenarios.get(args.scenario_id)
-                if not s:
-                    # search values for matching id or case_id
-                    s = next((v for v in scenarios.values() if (v.get("id") == args.scenario_id or v.get("case_id") == args.scenario_id)), None)
-            else:
-                s = next((x for x in scenarios if (x.get("id") == args.scenario_id or x.get("case_id") == args.scenario_id)), None)
-            if s:
-                user_text = s.get("user") or s.get("query") or s.get("text")
-        except Exception:
-            user_text = None
-    elif args.user_gen:
-        try:
-            r = requests.post(args.user_gen, json={"start": start, "goal": goal}, timeout=10)
-            r.raise_for_status()
-            gen = r.json()
-            user_text = gen.get("user") or gen.get("text")
-        except Exception:
-            user_text = None
-    else:
-        user_text = args.user or None
-
-    llm_params = {}
-    llm_constraints = {}
-    llm_weights = {}
-    print(f"User text for LLM: {user_text}")
-    if args.llm_parse and user_text:
-        print(f"Querying LLM parse endpoint: {args.llm_parse}")
-        try:
-            parsed = parse_user_with_llm(args.llm_parse, start, goal, user_text)
-            print(f"LLM parse response: {parsed}")
-            if not isinstance(parsed, dict):
-                print(f"WARNING: LLM parse response is not a dict, got type: {type(parsed)}")
-                llm_params = {}
+            posts_state = bool(state_path and post_state) or post_scenario
+            if posted_state is not None:
+                state_snapshot = posted_state
+            elif ctx is not None and ctx.state_snapshot is not None and not posts_state:
+                state_snapshot = ctx.state_snapshot
             else:
-                llm_params = parsed
-        except Exception as e:
-            print(f"LLM parse failed with exception: {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
-            llm_params = {}
-    elif not args.llm_parse:
-        print("No --llm-parse endpoint specified, skipping LLM parsing")
-    elif not user_text:
-        print("No user text available for LLM parsing")
-
-    print("Calling LLM-guided planner...")
-    try:
-        llm_category = llm_params.get("category", "") if isinstance(llm_params, dict) else ""
-        llm_constraints = llm_params.get("constraints", {}) if isinstance(llm_params, dict) else {}
-        llm_weights = llm_params.get("weights", {}) if isinstance(llm_params, dict) else {}
-        llm_resp = call_route(args.backend, start, goal, constraints=llm_constraints, weights=llm_weights)
-        llm_nodes = route_nodes_from_response(llm_resp)
-    except Exception as e:
-        print("Error calling LLM planner endpoint:", e)
-        llm_nodes = []
+                log("Snapshotting state from backend...")
+                with phase("snapshot", phase_ms):
+                    state_snapshot = snapshot_state(backend)
+
+            length_map = fut_len.result() if ctx is None else ctx.length_map
+
+            gt_constraints = {}
+            gt_weights = {}
+            if scenario_entry:
+                gt = scenario_entry.get("ground_truth") or {}
+                gt_constraints = gt.get("constraints") or {}
+                gt_weights = gt.get("weights") or {}
+            # both routes only read the posted state, so the GT call runs
+            # while the LLM parse finishes and the LLM-guided route is planned
+            log("Calling ground-truth planner...")
+            fut_gt = ex.submit(route_nodes, "gt", gt_constraints, gt_weights)
+
+            llm_params = fut_parse.result()
+            llm_category = llm_params.get("category", "") if isinstance(llm_params, dict) else ""
+            llm_constraints = llm_params.get("constraints", {}) if isinstance(llm_params, dict) else {}
+            llm_weights = llm_params.get("weights", {}) if isinstance(llm_params, dict) else {}
+            log("Calling LLM-guided planner...")
+            llm_nodes = route_nodes("llm", llm_constraints, llm_weights)
+            gt_nodes = fut_gt.result()
 
     gt_category = ""
     if scenario_entry:
         gt_category = scenario_entry.get("ground_truth", {}).get("category", "") or scenario_entry.get("category", "")
 
-    metrics = compute_metrics(
-        gt_nodes,
-        llm_nodes,
-        state_snapshot,
-        length_map,
-        gt_constraints=gt_constraints,
-        gt_weights=gt_weights,
-        llm_constraints=llm_constraints,
-        llm_weights=llm_weights,
-        gt_category=gt_category,
-        llm_category=llm_category,
-    )
+    with phase("metrics", phase_ms):
+        metrics = compute_metrics(
+            gt_nodes,
+            llm_nodes,
+            state_snapshot,
+            length_map,
+            gt_constraints=gt_constraints,
+            gt_weights=gt_weights,
+            llm_constraints=llm_constraints,
+            llm_weights=llm_weights,
+            gt_category=gt_category,
+            llm_category=llm_category,
+        )
     # augment metrics with scenario and user info
-    if args.scenario_id:
-        metrics["scenario_id"] = args.scenario_id
+    if scenario_id:
+        metrics["scenario_id"] = scenario_id
     metrics["user_text"] = user_text
-    print_metrics(metrics)
+    metrics["phase_ms"] = phase_ms
+    print_metrics(metrics, log=log)
 
-    out = getattr(args, "out", None)
     if out:
-        # append to JSON array in file, or create new
-        try:
-            if os.path.exists(out):
-                with open(out, "r", encoding="utf-8") as f:
-                    existing = json.load(f)
-                    if not isinstance(existing, list):
-                        existing = [existing]
-            else:
-                existing = []
-        except Exception:
-            existing = []
-        existing.append(metrics)
-        with open(out, "w", encoding="utf-8") as f:
-            json.dump(existing, f, indent=2, ensure_ascii=False)
-        print(f"Wrote metrics to {out}")
+        # append one JSON line to the file, or create it
+        append_metrics(out, metrics)
+        log(f"Wrote metrics to {out}")
+    return metrics
+
+
+def run_many(scenario_ids: Sequence[str], **options) -> List[Optional[dict]]:
+    """
+    run_once for each scenario id (other options as for run_once), sharing
+    one TrialContext. The state snapshot is re-taken per trial only when the
+    trials post state.
+    """
+    posts_state = bool(options.get("state") and options.get("post_state")) or bool(options.get("post_scenario"))
+    ctx = build_ctx(options.get("backend", "http://127.0.0.1:5000"), options.get("root", "."), reuse_snapshot=not posts_state)
+    return [run_once(**options, scenario_id=sid, ctx=ctx) for sid in scenario_ids]
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--backend", default="http://127.0.0.1:5000")
+    p.add_argument("--state", help="Path to state JSON to post (optional)")
+    p.add_argument("--scenario-id", help="Optional scenario identifier to record")
+    p.add_argument("--user-text", help="User inquiry text to feed to the LLM/planner (literal)")
+    p.add_argument("--user-from-scenarios", help="Path to scenarios.json to extract user text by scenario id")
+    p.add_argument("--post-scenario", action="store_true", help="Post the scenario's snapshot (from --user-from-scenarios) to backend before trial")
+    p.add_argument("--user-gen", help="Optional URL to call to generate user text; expects JSON {'user': '...'}")
+    p.add_argument("--post-state", action="store_true", help="Post --state to backend before trial")
+    p.add_argument("--start", help="Start node (optional; taken from scenario if omitted)")
+    p.add_argument("--goal", help="Goal node (optional; taken from scenario if omitted)")
+    p.add_argument("--user", default="")
+    p.add_argument("--llm-parse", help="LLM parse endpoint that returns params JSON")
+    p.add_argument("--root", default=".", help="Repo root for data/edges.json")
+    p.add_argument("--out", default="tools/trial_results.jsonl", help="Output JSON Lines file to append metrics to")
+    p.add_argument("--batch", help="File with one scenario id per line; runs them in order with shared setup")
+    args = p.parse_args()
+
+    options = vars(args)
+    batch = options.pop("batch")
+    if batch:
+        options.pop("scenario_id")
+        with open(batch, "r", encoding="utf-8") as f:
+            scenario_ids = [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+        run_many(scenario_ids, **options)
+    else:
+        run_once(**options)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,242 @@
+"""
+Numba-compiled A* core for app.py.
+Operates exclusively on the Struct-of-Arrays graph (integer node/arc ids),
+so the whole search runs without touching the interpreter.
+"""
+
+import functools
+import math
+
+import numpy as np
+from numba import njit
+
+
+STATUS_OPEN = 0
+STATUS_BLOCKED = 1
+
+V_MAX_MPS = 1.6        # must match app.py
+CROWD_ALPHA = 0.8
+
+# fastmath without nnan/ninf: the search compares against inf (unreached
+# g-scores, "no meeting point yet" mu), which those flags make undefined
+FASTMATH = {"nsz", "arcp", "contract", "afn", "reassoc"}
+
+
+# -----------------------------
+# Indexed binary min-heap with decrease-key (mirrors app.IndexedMinHeap)
+# -----------------------------
+@njit(cache=True, boundscheck=False)
+def _heap_less(key, a, b):
+    return key[a] < key[b] or (key[a] == key[b] and a < b)
+
+
+@njit(cache=True, boundscheck=False)
+def _heap_sift_up(heap, pos_in_heap, key, i):
+    node = heap[i]
+    while i > 0:
+        parent = (i - 1) >> 1
+        p_node = heap[parent]
+        if not _heap_less(key, node, p_node):
+            break
+        heap[i] = p_node
+        pos_in_heap[p_node] = i
+        i = parent
+    heap[i] = node
+    pos_in_heap[node] = i
+
+
+@njit(cache=True, boundscheck=False)
+def _heap_sift_down(heap, pos_in_heap, key, size, i):
+    node = heap[i]
+    while True:
+        child = 2 * i + 1
+        if child >= size:
+            break
+        if child + 1 < size and _heap_less(key, heap[child + 1], heap[child]):
+            child += 1
+        c_node = heap[child]
+        if not _heap_less(key, c_node, node):
+            break
+        heap[i] = c_node
+        pos_in_heap[c_node] = i
+        i = child
+    heap[i] = node
+    pos_in_heap[node] = i
+
+
+@njit(cache=True, boundscheck=False)
+def _heap_push_or_decrease(heap, pos_in_heap, key, size, node, f):
+    i = pos_in_heap[node]
+    if i == -1:
+        key[node] = f
+        heap[size] = node
+        pos_in_heap[node] = size
+        _heap_sift_up(heap, pos_in_heap, key, size)
+        return size + 1
+    if f < key[node]:
+        key[node] = f
+        _heap_sift_up(heap, pos_in_heap, key, i)
+    return size
+
+
+@njit(cache=True, boundscheck=False)
+def _heap_pop(heap, pos_in_heap, key, size):
+    node = heap[0]
+    size -= 1
+    pos_in_heap[node] = -1
+    if size > 0:
+        heap[0] = heap[size]
+        pos_in_heap[heap[0]] = 0
+        _heap_sift_down(heap, pos_in_heap, key, size, 0)
+    return node, size
+
+
+# -----------------------------
+# A* Search
+# -----------------------------
+@njit(cache=True, fastmath=FASTMATH, boundscheck=False)
+def _heuristic(pos, landmark_dist, node, goal, w_time, w_dist):
+    dx = np.float64(pos[node, 0]) - np.float64(pos[goal, 0])
+    dy = np.float64(pos[node, 1]) - np.float64(pos[goal, 1])
+    dz = np.float64(pos[node, 2]) - np.float64(pos[goal, 2])
+    dist = math.sqrt(dx * dx + dy * dy + dz * dz)
+    for i in range(landmark_dist.shape[1]):
+        alt = abs(np.float64(landmark_dist[goal, i]) - np.float64(landmark_dist[node, i]))
+        if alt > dist:
+            dist = alt
+    return w_time * (dist / V_MAX_MPS) + w_dist * dist
+
+
+@functools.lru_cache(maxsize=None)
+def specialized_core(avoid_stairs: bool, require_elev: bool):
+    """
+    Returns the compiled A* core for one combination of hard constraints.
+    The flags are closure constants, so each variant compiles without the
+    per-arc constraint branches it doesn't need (4 variants at most).
+    """
+    avoid_stairs = bool(avoid_stairs)
+    require_elev = bool(require_elev)
+
+    @njit(cache=True, fastmath=FASTMATH, boundscheck=False)
+    def astar_core(
+        pos, adj_offsets, adj_edges, radj_offsets, radj_edges, edge_u, edge_v,
+        length_m, base_time, ada, is_stairs, landmark_dist,
+        live_status, live_speed, live_crowd, live_hazard,
+        start_i, goal_i,
+        w_time, w_dist, w_crowd, w_risk,
+        g_score, came_from_node, came_from_edge, closed,
+        heap, pos_in_heap, key,
+    ):
+        """
+        Bidirectional A*, same scheme as app.astar_route.
+        Live arrays are expected pre-clamped (see app.LiveSnapshot).
+        The (2, N) work arrays come from app.SearchWorkspace, already reset.
+
+        Returns:
+          path_edges: int32 arc ids from start to goal
+          total_cost: float, inf if no path exists under the constraints/state
+        """
+        # row 0 = forward search from start, row 1 = backward search from goal
+        size = np.zeros(2, dtype=np.int64)
+        target = np.array([goal_i, start_i], dtype=np.int64)
+
+        g_score[0, start_i] = 0.0
+        g_score[1, goal_i] = 0.0
+        size[0] = _heap_push_or_decrease(heap[0], pos_in_heap[0], key[0], size[0], start_i,
+                                         _heuristic(pos, landmark_dist, start_i, goal_i, w_time, w_dist))
+        size[1] = _heap_push_or_decrease(heap[1], pos_in_heap[1], key[1], size[1], goal_i,
+                                         _heuristic(pos, landmark_dist, goal_i, start_i, w_time, w_dist))
+
+        mu = np.inf
+        meet = -1
+        if start_i == goal_i:
+            mu = 0.0
+            meet = start_i
+
+        d = 0
+        while size[0] > 0 and size[1] > 0:
+            if key[0, heap[0, 0]] >= mu or key[1, heap[1, 0]] >= mu:
+                break
+
+            current, size[d] = _heap_pop(heap[d], pos_in_heap[d], key[d], size[d])
+            closed[d, current] = 1
+            g_cur = g_score[d, current]
+
+            if d == 0:
+                lo = adj_offsets[current]
+                hi = adj_offsets[current + 1]
+            else:
+                lo = radj_offsets[current]
+                hi = radj_offsets[current + 1]
+
+            for k in range(lo, hi):
+                if d == 0:
+                    e = adj_edges[k]
+                    neighbor = edge_v[e]
+                else:
+                    e = radj_edges[k]
+                    neighbor = edge_u[e]
+
+                if live_status[e] == STATUS_BLOCKED:
+                    continue
+                if avoid_stairs and is_stairs[e]:
+                    continue
+                if require_elev and ada[e] == 0:
+                    continue
+                if closed[d, neighbor]:
+                    continue
+
+                length = np.float64(length_m[e])
+                crowd = np.float64(live_crowd[e])
+                hazard = np.float64(live_hazard[e])
+                time_s = np.float64(base_time[e]) * np.float64(live_speed[e]) * (1.0 + CROWD_ALPHA * crowd)
+                cost = (
+                    w_time * time_s
+                    + w_dist * length
+                    + w_crowd * crowd * length
+                    + w_risk * hazard * length
+                )
+
+                tentative_g = g_cur + cost
+                if tentative_g < g_score[d, neighbor]:
+                    came_from_node[d, neighbor] = current
+                    came_from_edge[d, neighbor] = e
+                    g_score[d, neighbor] = tentative_g
+                    size[d] = _heap_push_or_decrease(
+                        heap[d], pos_in_heap[d], key[d], size[d], neighbor,
+                        tentative_g + _heuristic(pos, landmark_dist, neighbor, target[d], w_time, w_dist))
+
+                    total = tentative_g + g_score[1 - d, neighbor]
+                    if total < mu:
+                        mu = total
+                        meet = neighbor
+
+            d = 1 - d
+
+        if meet == -1:
+            return np.empty(0, dtype=np.int32), np.inf
+
+        # start .. meet from the forward tree, meet .. goal from the backward tree
+        n_fwd = 0
+        c = meet
+        while came_from_node[0, c] != -1:
+            n_fwd += 1
+            c = came_from_node[0, c]
+        n_bwd = 0
+        c = meet
+        while came_from_node[1, c] != -1:
+            n_bwd += 1
+            c = came_from_node[1, c]
+
+        path = np.empty(n_fwd + n_bwd, dtype=np.int32)
+        c = meet
+        for k in range(n_fwd - 1, -1, -1):
+            path[k] = came_from_edge[0, c]
+            c = came_from_node[0, c]
+        c = meet
+        for k in range(n_fwd, n_fwd + n_bwd):
+            path[k] = came_from_edge[1, c]
+            c = came_from_node[1, c]
+        return path, mu
+
+    return astar_core
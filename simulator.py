@@ -1,9 +1,15 @@
 import argparse
 import json
 import os
-import random
 import time
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # stdlib json fallback
+    orjson = None
 
 HERE = os.path.dirname(__file__)
 # Use the script directory as the repo root so data/edges.json resolves to
@@ -11,34 +17,42 @@ HERE = os.path.dirname(__file__)
 ROOT = os.path.abspath(HERE)
 EDGES_PATH = os.path.join(ROOT, "data", "edges.json")
 
+# keep-alive connection reused by every periodic update
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=0))
+
 def normalize(n):
     return (n or "").strip().upper()
 
 def backend_edge_id(a, b):
     return f"{normalize(a)}__{normalize(b)}"
 
-def build_payload(edges, version):
-    out = {"graphVersion": version, "edges": {}}
+def edge_id_pairs(edges):
+    """(a__b, b__a) backend ids per edge, built once instead of every update."""
+    pairs = []
     for e in edges:
         a = e.get("from")
         b = e.get("to")
         if not a or not b: 
             continue
-        # symmetric update for both directions
-        id1 = backend_edge_id(a, b)
-        id2 = backend_edge_id(b, a)
+        pairs.append((backend_edge_id(a, b), backend_edge_id(b, a)))
+    return pairs
 
-        # random crowd, occasional hazards, speed factor influenced by crowd
-        crowd = round(random.random(), 3)
-        hazard = 0.0
-        # small chance of hazard; higher crowd increases hazard chance slightly
-        if random.random() < 0.03 + 0.1 * crowd:
-            hazard = round(random.uniform(0.5, 1.0), 3)
+def build_payload(pairs, version, rng):
+    """One random state update for all edges, drawn as whole arrays from `rng`."""
+    n = len(pairs)
+    # random crowd, occasional hazards, speed factor influenced by crowd
+    crowd = np.round(rng.random(n), 3)
+    # small chance of hazard; higher crowd increases hazard chance slightly
+    hazard = np.where(rng.random(n) < 0.03 + 0.1 * crowd, np.round(rng.uniform(0.5, 1.0, n), 3), 0.0)
+    speed_factor = np.round(1.0 + 0.5 * crowd + np.where(rng.random(n) < 0.05, 0.5, 0.0), 3)
+    blocked = hazard > 0.9
 
-        speed_factor = round(1.0 + 0.5 * crowd + (0.5 if random.random() < 0.05 else 0.0), 3)
-        status = "blocked" if hazard > 0.9 else "open"
-
-        st = {"status": status, "crowdLevel": crowd, "speedFactor": speed_factor, "hazardLevel": hazard}
+    out = {"graphVersion": version, "edges": {}}
+    for (id1, id2), c, s, h, b in zip(pairs, crowd.tolist(), speed_factor.tolist(), hazard.tolist(), blocked.tolist()):
+        st = {"status": "blocked" if b else "open", "crowdLevel": c, "speedFactor": s, "hazardLevel": h}
+        # symmetric update for both directions
         out["edges"][id1] = st
         out["edges"][id2] = st
     return out
@@ -50,23 +64,30 @@ def main():
     p.add_argument("--seed", type=int, default=None, help="Random seed")
     args = p.parse_args()
 
-    if args.seed is not None:
-        random.seed(args.seed)
+    rng = np.random.default_rng(args.seed)
 
     if not os.path.exists(EDGES_PATH):
         print("Missing edges.json at", EDGES_PATH); return
 
-    with open(EDGES_PATH, "r", encoding="utf-8") as f:
-        edges = json.load(f)
+    if orjson is not None:
+        with open(EDGES_PATH, "rb") as f:
+            edges = orjson.loads(f.read())
+    else:
+        with open(EDGES_PATH, "r", encoding="utf-8") as f:
+            edges = json.load(f)
+    pairs = edge_id_pairs(edges)
 
     ver = 1
     url = args.backend.rstrip("/") + "/api/state/update"
     print("Posting state to", url, "every", args.interval, "s")
 
     while True:
-        payload = build_payload(edges, ver)
+        payload = build_payload(pairs, ver, rng)
         try:
-            r = requests.post(url, json=payload, timeout=5)
+            if orjson is not None:
+                r = SESSION.post(url, data=orjson.dumps(payload), headers={"Content-Type": "application/json"}, timeout=5)
+            else:
+                r = SESSION.post(url, json=payload, timeout=5)
             if r.ok:
                 print(f"ver={ver} posted ok, edges={len(payload['edges'])}")
             else:
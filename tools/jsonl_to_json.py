@@ -0,0 +1,30 @@
+"""
+Convert the JSON Lines trial results written by run_trail.py into a single
+JSON array (the format older analysis scripts expect).
+
+    python tools/jsonl_to_json.py tools/trial_results.jsonl tools/trial_results.json
+"""
+
+import argparse
+import json
+
+
+def read_jsonl(path: str) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    p = argparse.ArgumentParser(description="Convert a JSON Lines results file to a JSON array")
+    p.add_argument("src", help="Input .jsonl file")
+    p.add_argument("dst", help="Output .json file")
+    args = p.parse_args()
+
+    records = read_jsonl(args.src)
+    with open(args.dst, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {len(records)} records to {args.dst}")
+
+
+if __name__ == "__main__":
+    main()